@@ -3,11 +3,520 @@
 Decorator to cache query results to avoid redundant database calls
 """
 
+import hashlib
+import os
+import pickle
+import re
 import sqlite3
+import sys
+import threading
+import time
 import functools
+from collections import Counter, OrderedDict
 
-# In-memory cache
-query_cache = {}
+# Statements that may be cached: a SELECT or WITH ... SELECT (after
+# comments are removed) that changes nothing, see is_read_query
+READ_RE = re.compile(r"^[\s(]*(SELECT|WITH)\b", re.IGNORECASE)
+WRITE_KEYWORD_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+# A FROM/JOIN/INTO/UPDATE/TABLE clause, up to the next keyword or
+# parenthesis; FROM and UPDATE clauses may list several tables
+TABLE_CLAUSE_RE = re.compile(
+    r"(?<!\bKEY\s)(?<!\bDO\s)\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\b(.*?)"
+    r"(?=\b(?:WHERE|GROUP|ORDER|LIMIT|HAVING|UNION|INTERSECT|EXCEPT|ON|USING|SET"
+    r"|VALUES|SELECT|DEFAULT|RETURNING|WINDOW|NATURAL|INNER|LEFT|RIGHT|FULL|CROSS"
+    r"|OUTER|JOIN)\b|[();]|$)",
+    re.IGNORECASE | re.DOTALL
+)
+# One table reference: [IF [NOT] EXISTS] [schema.]table [[AS] alias]
+TABLE_NAME_RE = re.compile(
+    r"^\s*(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(?:[`\"\[]?\w+[`\"\]]?\s*\.\s*)?"
+    r"[`\"\[]?(\w+)[`\"\]]?(?:\s+(?:AS\s+)?\w+)?\s*$",
+    re.IGNORECASE
+)
+
+# Quoted string literals, which normalization must leave untouched
+LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+# Every quoted token normalization must leave untouched: '...',
+# "..." (a string literal to SQLite and MySQL), `...` and [...]
+QUOTED_RE = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])"""
+)
+# -- and /* */ comments
+COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# A string literal (kept) or a comment (removed)
+_LITERAL_OR_COMMENT_RE = re.compile(
+    f"{LITERAL_RE.pattern}|{COMMENT_RE.pattern}", re.DOTALL
+)
+
+
+def strip_comments(query):
+    """query with its comments replaced by spaces, literals kept"""
+    return _LITERAL_OR_COMMENT_RE.sub(lambda match: match.group(1) or " ", query)
+
+
+def is_read_query(query):
+    """
+    True only for statements that provably just read data: a SELECT,
+    or a WITH whose body has no INSERT/UPDATE/DELETE/REPLACE (keywords
+    inside string literals and comments do not count)
+    """
+    code = LITERAL_RE.sub("''", strip_comments(query))
+    return bool(READ_RE.match(code)) and not WRITE_KEYWORD_RE.search(code)
+
+
+def normalize_query(query):
+    """
+    Collapse whitespace and lower-case a SQL statement outside its
+    quoted tokens (QUOTED_RE), so formatting differences map to the
+    same query but "Alice" and "alice" stay different
+    """
+    parts = QUOTED_RE.split(query.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i]).lower()
+    return "".join(parts)
+
+
+def query_fingerprint(query, params=()):
+    """
+    Cache key for a query and its bound parameters: a hash of the
+    normalized SQL plus the parameter values (sequence or mapping)
+    """
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif params is not None:
+        params = tuple(params)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(normalize_query(query).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(repr(params).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def query_tables(query):
+    """
+    Lower-cased names of the tables a SQL statement reads or writes,
+    or None when they cannot be determined reliably (derived tables,
+    unusual quoting, ...); such statements must not be cached
+    """
+    query = LITERAL_RE.sub("''", strip_comments(query))
+    tables = set()
+    for clause in TABLE_CLAUSE_RE.findall(query):
+        for item in clause.split(","):
+            match = TABLE_NAME_RE.match(item)
+            if match is None:
+                return None
+            tables.add(match.group(1).lower())
+    return frozenset(tables)
+
+
+def result_size(result):
+    """Approximate memory footprint of a result (a list of row tuples)"""
+    size = sys.getsizeof(result)
+    if isinstance(result, (list, tuple)):
+        for row in result:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class DiskCache:
+    """
+    Second cache tier in a local SQLite file, shared by every process
+    on the host that opens the same path. Results are pickled, so only
+    point it at a file that trusted processes write. When the stored
+    results exceed max_bytes, the least recently read ones are
+    evicted. Errors (e.g. a locked file) turn into misses, so a broken
+    tier never fails a query.
+
+    Each table has a generation in the file, bumped by every
+    invalidation (from any process). A loader takes versions() before
+    running its query and passes them to set(), which only stores the
+    result if no invalidation happened in between.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                tables TEXT NOT NULL,
+                expires REAL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_query_cache_accessed ON query_cache (accessed)"
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_cache_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+
+    def versions(self, tables):
+        """
+        {table: generation} for tables, plus "*" (bumped by clear),
+        or None if the file cannot be read
+        """
+        try:
+            with self._lock:
+                return self._versions(tables)
+        except sqlite3.Error:
+            return None
+
+    def _versions(self, tables):
+        names = sorted(set(tables) | {"*"})
+        placeholders = ", ".join(["?"] * len(names))
+        stored = dict(self._conn.execute(
+            f"SELECT name, version FROM query_cache_versions WHERE name IN ({placeholders})",
+            names
+        ).fetchall())
+        return {name: stored.get(name, 0) for name in names}
+
+    def _bump(self, names):
+        for name in names:
+            self._conn.execute(
+                "INSERT INTO query_cache_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (name,)
+            )
+
+    def get(self, key):
+        """(result, seconds left to live or None) for key, or None"""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires FROM query_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] is not None and row[1] <= now:
+                    self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                    return None
+                self._conn.execute(
+                    "UPDATE query_cache SET accessed = ? WHERE key = ?", (now, key)
+                )
+        except sqlite3.Error:
+            return None
+        try:
+            result = pickle.loads(row[0])
+        except Exception:
+            # Truncated or written by incompatible code: treat as a miss
+            return None
+        return result, (row[1] - now if row[1] is not None else None)
+
+    def set(self, key, result, tables=(), ttl=None, versions=None):
+        """
+        Store result under key, then evict down to max_bytes. With
+        versions (from versions(tables) taken before the result was
+        loaded), nothing is stored if any of tables was invalidated since.
+        """
+        try:
+            value = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        # ",users,orders," so one table matches with LIKE '%,users,%'
+        names = "," + ",".join(sorted(tables)) + ","
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Checked under the write lock, so no invalidation
+                    # can slip in between the check and the insert
+                    if versions is not None and self._versions(tables) != versions:
+                        self._conn.execute("ROLLBACK")
+                        return
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO query_cache "
+                        "(key, value, size, tables, expires, accessed) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, value, len(value), names,
+                         now + ttl if ttl is not None else None, now)
+                    )
+                    self._evict()
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            pass
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM query_cache"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._conn.execute("DELETE FROM query_cache WHERE expires <= ?", (time.time(),))
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM query_cache"
+        ).fetchone()[0]
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM query_cache ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+            total -= size
+
+    def invalidate_tables(self, tables):
+        """Drop every stored result that read one of tables"""
+        self._invalidate(tables, [
+            ("DELETE FROM query_cache WHERE tables LIKE ?", (f"%,{table},%",))
+            for table in tables
+        ])
+
+    def clear(self):
+        """Drop every stored result, also from loads still in progress"""
+        self._invalidate(["*"], [("DELETE FROM query_cache", ())])
+
+    def _invalidate(self, names, deletes):
+        # Generations and rows change in one transaction
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._bump(names)
+                    for sql, params in deletes:
+                        self._conn.execute(sql, params)
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            pass
+
+
+class _Flight:
+    """One in-progress load that concurrent misses wait on"""
+
+    def __init__(self, versions):
+        self.done = threading.Event()
+        self.versions = versions
+        self.result = None
+        self.error = None
+
+
+class QueryCache:
+    """
+    Bounded LRU cache for query results.
+
+    Holds at most max_entries results and max_bytes (approximate)
+    bytes, evicting the least recently used entries first. Entries
+    expire ttl seconds after they are stored (None: never), and
+    invalidate_tables drops every entry that read a given table.
+    All methods are thread-safe; get_or_load runs concurrent misses
+    for the same key only once. With a DiskCache as disk, get_or_load
+    checks it before running a query and stores new results in it.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300,
+                 disk=None):
+        self.disk = disk
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (result, size, expires, tables)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._inflight = {}             # key -> _Flight
+        self._table_versions = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.disk_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, key, count=True):
+        """The cached result for key, or None (counted as hit or miss)"""
+        with self._lock:
+            return self._get(key, count)
+
+    def _get(self, key, count):
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return entry[0]
+
+    def set(self, key, result, tables=(), ttl=None):
+        """Store result under key; ttl overrides the cache default"""
+        size = result_size(result)
+        with self._lock:
+            self._set(key, result, size, tables, ttl)
+
+    def _set(self, key, result, size, tables, ttl):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (result, size, expires, frozenset(tables))
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get_or_load(self, key, load, tables=(), ttl=None):
+        """
+        The cached result for key, or load() stored under key.
+        Concurrent callers missing the same key wait for a single
+        load() and share its result (or its exception). A load that
+        overlaps an invalidation of its tables is returned but not
+        cached. A result found in the disk tier is promoted to memory
+        instead of being loaded. Returns (result, loaded): loaded is
+        True for the one caller that ran load().
+        """
+        tables = frozenset(table.lower() for table in tables)
+        with self._lock:
+            result = self._get(key, count=True)
+            if result is not None:
+                return result, False
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                versions = self._versions(tables)
+                flight = self._inflight[key] = _Flight(versions)
+                disk_versions = None
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+
+        loaded = False
+        try:
+            if self.disk is not None:
+                # Taken before the query runs, for the check in disk.set
+                disk_versions = self.disk.versions(tables)
+            stored = self.disk.get(key) if self.disk is not None else None
+            if stored is not None:
+                flight.result, remaining = stored
+            else:
+                flight.result = load()
+                loaded = True
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            size = result_size(flight.result)
+            with self._lock:
+                fresh = self._versions(tables) == flight.versions
+                if not loaded:
+                    self.disk_hits += 1
+                    if fresh:
+                        self._set(key, flight.result, size, tables, remaining)
+                elif fresh:
+                    self._set(key, flight.result, size, tables, ttl)
+            if loaded and fresh and disk_versions is not None:
+                self.disk.set(key, flight.result, tables, self.ttl if ttl is None else ttl,
+                              disk_versions)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+        return flight.result, loaded
+
+    def _versions(self, tables):
+        # "*" is bumped by invalidate_all and covers every table
+        versions = {table: self._table_versions[table] for table in tables}
+        versions["*"] = self._table_versions["*"]
+        return versions
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that read one of tables; returns how many"""
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            self._table_versions.update(tables)
+            stale = [key for key, entry in self._entries.items() if entry[3] & tables]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+        if self.disk is not None:
+            self.disk.invalidate_tables(tables)
+        return len(stale)
+
+    def invalidate_all(self):
+        """Drop every entry, also from loads still in progress"""
+        with self._lock:
+            self._table_versions["*"] += 1
+            self.invalidations += len(self._entries)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Counters and current size, e.g. for logging"""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "coalesced": self.coalesced,
+            "disk_hits": self.disk_hits,
+        }
+
+
+# Shared cache used by cache_query; set QUERY_CACHE_DB to a file path
+# to add the on-disk tier shared by processes on this host
+query_cache = QueryCache(
+    disk=DiskCache(os.environ["QUERY_CACHE_DB"]) if os.getenv("QUERY_CACHE_DB") else None
+)
 
 
 def with_db_connection(func):
@@ -26,31 +535,59 @@ def with_db_connection(func):
     return wrapper
 
 
-def cache_query(func):
+def cache_query(func=None, ttl=None):
     """
-    Decorator that caches query results based on the SQL query string.
+    Decorator that caches query results, keyed by query_fingerprint of
+    the SQL (query, args[1]) and its parameters (params, args[2]).
+    Use as @cache_query or @cache_query(ttl=60). Concurrent calls
+    missing the same key run the query once. Only statements that
+    is_read_query accepts are cached; anything else (INSERT, UPDATE,
+    a WITH ... DELETE, PRAGMA, ...) runs and then invalidates the
+    cached results of every table it touches (all of them if the
+    tables cannot be parsed). Reads whose tables cannot be parsed are
+    not cached.
     """
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Extract query string from kwargs or args
         query = kwargs.get("query") or (args[1] if len(args) > 1 else None)
-        if query in query_cache:
-            print(f"Using cached result for query: {query}")
-            return query_cache[query]
+        if query is None:
+            return func(*args, **kwargs)
 
-        # Execute function and cache result
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        print(f"Caching result for query: {query}")
+        tables = query_tables(query)
+        if not is_read_query(query):
+            result = func(*args, **kwargs)
+            if tables:
+                query_cache.invalidate_tables(tables)
+            else:
+                # Unknown target: anything cached may now be stale
+                query_cache.invalidate_all()
+            return result
+        if tables is None:
+            # Cannot tell which writes would make it stale
+            return func(*args, **kwargs)
+
+        params = kwargs.get("params", args[2] if len(args) > 2 else ())
+        key = query_fingerprint(query, params)
+        # Concurrent misses for the same key share one execution
+        result, loaded = query_cache.get_or_load(
+            key, lambda: func(*args, **kwargs), tables, ttl)
+        if loaded:
+            print(f"Caching result for query: {query}")
+        else:
+            print(f"Using cached result for query: {query}")
         return result
     return wrapper
 
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 
@@ -62,4 +599,9 @@ if __name__ == "__main__":
 
     # Second call will fetch from cache instead of DB
     users_again = fetch_users_with_cache(query="SELECT * FROM users")
-    print(users_again)
\ No newline at end of file
+    print(users_again)
+
+    # Parameters are part of the key, formatting is not
+    fetch_users_with_cache(query="SELECT * FROM users WHERE id = ?", params=(1,))
+    fetch_users_with_cache(query="select *  from users where id = ?", params=(1,))
+    fetch_users_with_cache(query="SELECT * FROM users WHERE id = ?", params=(2,))
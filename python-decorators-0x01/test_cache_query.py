@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""Unit tests for the QueryCache engine behind 4-cache_query.cache_query."""
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+cache_query = __import__("4-cache_query")
+QueryCache = cache_query.QueryCache
+DiskCache = cache_query.DiskCache
+query_tables = cache_query.query_tables
+is_read_query = cache_query.is_read_query
+
+
+class TestQueryTables(unittest.TestCase):
+    """Test cases for query_tables."""
+
+    def test_tables(self):
+        """Test the tables of statements that can be parsed."""
+        cases = [
+            ("SELECT * FROM users", {"users"}),
+            ("SELECT * FROM users u, orders o WHERE u.id = o.user_id",
+             {"users", "orders"}),
+            ("SELECT * FROM main.users", {"users"}),
+            ("SELECT * FROM `app`.`Users` AS u LEFT JOIN orders ON 1",
+             {"users", "orders"}),
+            ("SELECT * FROM users WHERE name = 'from accounts'", {"users"}),
+            ("SELECT * FROM users WHERE id IN (SELECT user_id FROM orders)",
+             {"users", "orders"}),
+            ("INSERT INTO users (name) VALUES (?)", {"users"}),
+            ("UPDATE users SET age = 1", {"users"}),
+            ("DELETE FROM users", {"users"}),
+            ("SELECT 1", set()),
+            ("-- refresh\nUPDATE users SET age = 1", {"users"}),
+            ("SELECT * FROM users /* FROM orders */", {"users"}),
+        ]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(query_tables(query), expected)
+
+    def test_unparseable(self):
+        """Test derived tables make the tables unknown."""
+        for query in ("SELECT COUNT(*) FROM (SELECT * FROM users) t",
+                      "SELECT * FROM users u, (SELECT 1) x"):
+            with self.subTest(query=query):
+                self.assertIsNone(query_tables(query))
+
+    def test_is_read_query(self):
+        """Test only statements that provably just read are reads."""
+        cases = [
+            ("SELECT * FROM users", True),
+            ("  (SELECT * FROM users)", True),
+            ("/* report */ SELECT * FROM users", True),
+            ("WITH x AS (SELECT * FROM users) SELECT * FROM x", True),
+            ("SELECT * FROM users WHERE name = 'delete me'", True),
+            ("WITH x AS (SELECT 1) DELETE FROM users WHERE id = 1 RETURNING id",
+             False),
+            ("-- fix ages\nUPDATE users SET age = 1", False),
+            ("INSERT INTO users (name) VALUES ('a')", False),
+            ("PRAGMA table_info(users)", False),
+        ]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(is_read_query(query), expected)
+
+
+class TestQueryFingerprint(unittest.TestCase):
+    """Test cases for normalize_query and query_fingerprint."""
+
+    def test_reformatted_queries_share_a_key(self):
+        """Test whitespace, case and a trailing ; do not change the key."""
+        key = cache_query.query_fingerprint("SELECT * FROM users WHERE id = ?", (1,))
+        for query in ("select *\n  from users\twhere id = ?;",
+                      "  SELECT * FROM USERS WHERE ID = ?  "):
+            with self.subTest(query=query):
+                self.assertEqual(cache_query.query_fingerprint(query, (1,)), key)
+
+    def test_params_change_the_key(self):
+        """Test different parameters give different keys."""
+        query = "SELECT * FROM users WHERE id = ?"
+        keys = {cache_query.query_fingerprint(query, params)
+                for params in ((1,), (2,), ("1",), {"id": 1}, ())}
+        self.assertEqual(len(keys), 5)
+
+    def test_quoted_tokens_keep_their_case(self):
+        """Test literals and quoted names are not normalized."""
+        for quoted in ("'Alice'", '"Alice"', "`Alice`", "[Alice]"):
+            with self.subTest(quoted=quoted):
+                query = f"SELECT * FROM users WHERE name = {quoted}"
+                self.assertNotEqual(
+                    cache_query.query_fingerprint(query),
+                    cache_query.query_fingerprint(query.replace("Alice", "alice")))
+                self.assertIn(quoted, cache_query.normalize_query(query))
+
+    def test_double_quoted_literal_is_not_shared(self):
+        """Test "alice" is not served the cached rows of "Alice"."""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE users (name TEXT)")
+        conn.execute("INSERT INTO users VALUES ('Alice'), ('alice')")
+        cache_query.query_cache.clear()
+
+        @cache_query.cache_query
+        def run(conn, query):
+            return conn.execute(query).fetchall()
+        self.assertEqual(run(conn, 'SELECT name FROM users WHERE name = "Alice"'),
+                         [("Alice",)])
+        self.assertEqual(run(conn, 'SELECT name FROM users WHERE name = "alice"'),
+                         [("alice",)])
+        conn.close()
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test cases for QueryCache eviction, expiry and invalidation."""
+
+    def test_evicts_by_entries(self):
+        """Test the least recently used entry goes past max_entries."""
+        cache = QueryCache(max_entries=2)
+        cache.set("a", [1])
+        cache.set("b", [2])
+        cache.get("a")
+        cache.set("c", [3])
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_evicts_by_bytes(self):
+        """Test entries are evicted to stay under max_bytes."""
+        row = [("x" * 100,)]
+        size = cache_query.result_size(row)
+        cache = QueryCache(max_bytes=2 * size)
+        for key in "abc":
+            cache.set(key, row)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("a", cache)
+        self.assertLessEqual(cache.size_bytes, 2 * size)
+
+    def test_skips_results_over_max_bytes(self):
+        """Test a result larger than max_bytes is not stored."""
+        cache = QueryCache(max_bytes=10)
+        cache.set("a", [("x" * 100,)])
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_expiry(self):
+        """Test entries expire after their ttl."""
+        cache = QueryCache(ttl=0.05)
+        cache.set("a", [1])
+        cache.set("b", [2], ttl=60)
+        self.assertEqual(cache.get("a"), [1])
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), [2])
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_invalidate_tables(self):
+        """Test invalidation drops only entries that read the tables."""
+        cache = QueryCache()
+        cache.set("users", [1], tables={"users"})
+        cache.set("join", [2], tables={"users", "orders"})
+        cache.set("orders", [3], tables={"orders"})
+        self.assertEqual(cache.invalidate_tables({"Users"}), 2)
+        self.assertNotIn("users", cache)
+        self.assertNotIn("join", cache)
+        self.assertIn("orders", cache)
+
+    def test_invalidate_all(self):
+        """Test invalidate_all drops every entry."""
+        cache = QueryCache()
+        cache.set("a", [1], tables={"users"})
+        cache.set("b", [2])
+        cache.invalidate_all()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size_bytes, 0)
+
+
+class TestCacheQuery(unittest.TestCase):
+    """Test cases for the cache_query decorator."""
+
+    def setUp(self):
+        """Open an in-memory users table and empty the shared cache."""
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        self.conn.execute("INSERT INTO users VALUES (1, 'Alice'), (2, 'Bob')")
+        cache_query.query_cache.clear()
+        self.calls = []
+
+        @cache_query.cache_query
+        def run(conn, query, params=()):
+            self.calls.append(query)
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        self.run_query = run
+
+    def tearDown(self):
+        """Close the connection."""
+        self.conn.close()
+
+    def count(self):
+        """Rows currently in users."""
+        return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def test_caches_reads(self):
+        """Test a repeated read runs once."""
+        query = "SELECT name FROM users WHERE id = ?"
+        self.assertEqual(self.run_query(self.conn, query, (1,)), [("Alice",)])
+        self.assertEqual(self.run_query(self.conn, query, (1,)), [("Alice",)])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_cte_write_is_not_cached(self):
+        """Test a WITH ... DELETE runs every time."""
+        query = "WITH x AS (SELECT 1) DELETE FROM users WHERE id = 1 RETURNING id"
+        self.assertEqual(self.run_query(self.conn, query), [(1,)])
+        self.conn.execute("INSERT INTO users VALUES (1, 'Alice')")
+        self.assertEqual(self.run_query(self.conn, query), [(1,)])
+        self.assertEqual(self.count(), 1)
+
+    def test_commented_write_invalidates(self):
+        """Test an UPDATE after a comment runs and drops cached reads."""
+        read = "SELECT name FROM users WHERE id = 1"
+        self.run_query(self.conn, read)
+        self.run_query(self.conn, "-- rename\nUPDATE users SET name = 'Ann' WHERE id = 1")
+        self.assertEqual(self.run_query(self.conn, read), [("Ann",)])
+        self.assertEqual(len(self.calls), 3)
+
+
+class TestDiskCache(unittest.TestCase):
+    """Test cases for DiskCache, with two instances on one file."""
+
+    def setUp(self):
+        """Open two caches on the same temporary file."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "cache.db")
+        self.first = DiskCache(path)
+        self.second = DiskCache(path)
+
+    def tearDown(self):
+        """Close both caches and remove the file."""
+        self.first._conn.close()
+        self.second._conn.close()
+        self.tmp.cleanup()
+
+    def test_shared_between_instances(self):
+        """Test a result stored by one instance is served by the other."""
+        self.first.set("k", [("alice",)], {"users"}, ttl=60)
+        result, remaining = self.second.get("k")
+        self.assertEqual(result, [("alice",)])
+        self.assertLessEqual(remaining, 60)
+
+    def test_expired_result_is_a_miss(self):
+        """Test a result past its ttl is not served."""
+        self.first.set("k", [1], {"users"}, ttl=-1)
+        self.assertIsNone(self.second.get("k"))
+
+    def test_invalidate_tables(self):
+        """Test invalidation through one instance removes it for both."""
+        self.first.set("users", [1], {"users"})
+        self.first.set("orders", [2], {"orders"})
+        self.second.invalidate_tables({"users"})
+        self.assertIsNone(self.first.get("users"))
+        self.assertIsNone(self.second.get("users"))
+        self.assertEqual(self.first.get("orders")[0], [2])
+
+    def test_stale_versions_store_nothing(self):
+        """Test set() skips a result loaded before an invalidation."""
+        versions = self.first.versions({"users"})
+        self.second.invalidate_tables({"users"})
+        self.first.set("k", [1], {"users"}, versions=versions)
+        self.assertIsNone(self.second.get("k"))
+        self.first.set("k", [1], {"users"}, versions=self.first.versions({"users"}))
+        self.assertEqual(self.second.get("k")[0], [1])
+
+    def test_clear_makes_all_versions_stale(self):
+        """Test clear() also stops loads of any table in progress."""
+        versions = self.first.versions({"users"})
+        self.second.clear()
+        self.first.set("k", [1], {"users"}, versions=versions)
+        self.assertIsNone(self.first.get("k"))
+
+    def test_evicts_to_max_bytes(self):
+        """Test the stored total stays under max_bytes, oldest read first."""
+        size = len(pickle.dumps(b"x" * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+        self.first.max_bytes = 3 * size
+        for key in "abc":
+            self.first.set(key, b"x" * 1000)
+            time.sleep(0.01)
+        self.first.get("a")
+        self.first.set("d", b"x" * 1000)
+        total = self.first._conn.execute(
+            "SELECT SUM(size) FROM query_cache").fetchone()[0]
+        self.assertLessEqual(total, self.first.max_bytes)
+        self.assertIsNone(self.second.get("b"))
+        self.assertIsNotNone(self.second.get("a"))
+        self.assertIsNotNone(self.second.get("d"))
+
+    def test_expired_rows_count_before_eviction(self):
+        """Test dropping expired rows frees room for live ones."""
+        size = len(pickle.dumps(b"x" * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+        self.first.max_bytes = 2 * size
+        self.first.set("expired", b"x" * 1000, ttl=-1)
+        self.first.set("live", b"x" * 1000)
+        self.first.set("new", b"x" * 1000)
+        self.assertIsNotNone(self.second.get("live"))
+        self.assertIsNotNone(self.second.get("new"))
+
+    def test_corrupt_blob_is_a_miss(self):
+        """Test a value that cannot be unpickled comes back as None."""
+        self.first.set("k", [("alice",)])
+        self.first._conn.execute(
+            "UPDATE query_cache SET value = ? WHERE key = 'k'",
+            (pickle.dumps([("alice",)])[:-2],))
+        self.assertIsNone(self.second.get("k"))
+
+
+class TestGetOrLoad(unittest.TestCase):
+    """Test cases for single-flight loading in QueryCache.get_or_load."""
+
+    def run_threads(self, target, count):
+        """Start count threads running target and wait for them."""
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_coalesces_concurrent_misses(self):
+        """Test N threads missing the same key run load() once."""
+        cache = QueryCache()
+        calls = []
+        results = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            return [("alice",)]
+
+        self.run_threads(
+            lambda: results.append(cache.get_or_load("k", load, {"users"})), 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], [[("alice",)]] * 8)
+        self.assertEqual(sum(loaded for _, loaded in results), 1)
+        self.assertEqual(cache.stats()["coalesced"], 7)
+        self.assertEqual(cache.get("k"), [("alice",)])
+
+    def test_error_propagates_to_followers(self):
+        """Test every waiting caller gets the leader's exception."""
+        cache = QueryCache()
+        calls = []
+        errors = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            raise ValueError("query failed")
+
+        def call():
+            try:
+                cache.get_or_load("k", load)
+            except ValueError as e:
+                errors.append(e)
+
+        self.run_threads(call, 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 5)
+        self.assertNotIn("k", cache)
+
+    def test_invalidation_during_load_prevents_caching(self):
+        """Test a load overlapping an invalidation is returned, not cached."""
+        cache = QueryCache()
+        started = threading.Event()
+        release = threading.Event()
+
+        def load():
+            started.set()
+            release.wait()
+            return [("stale",)]
+
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(cache.get_or_load("k", load, {"users"})))
+        thread.start()
+        started.wait()
+        cache.invalidate_tables({"users"})
+        release.set()
+        thread.join()
+        self.assertEqual(results, [([("stale",)], True)])
+        self.assertNotIn("k", cache)
+        result, loaded = cache.get_or_load("k", lambda: [("fresh",)], {"users"})
+        self.assertEqual((result, loaded), ([("fresh",)], True))
+        self.assertIn("k", cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
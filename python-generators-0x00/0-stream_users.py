@@ -3,56 +3,89 @@
 Generator that streams rows from user_data table in ALX_prodev database
 """
 
-import mysql.connector
-import os
-from dotenv import load_dotenv
+import backend
+from rows import row_type
 
-# Load environment variables from .env file
-load_dotenv()
 
 def get_db_config():
     """Get database configuration from environment variables"""
-    return {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'user': os.getenv('DB_USER', 'root'),
-        'password': os.getenv('DB_PASSWORD', ''),
-        'database': os.getenv('DB_NAME', 'ALX_prodev'),
-        'port': os.getenv('DB_PORT', '3306')
-    }
-
-def stream_users():
-    """Generator that yields rows from user_data one by one"""
+    import db_pool
+    return db_pool.get_db_config()
+
+
+def _fetch_rows(cursor, size):
+    """Yield rows from cursor, reading at most size rows per fetch"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield from rows
+
+
+def stream_users(streaming=False, prefetch=1000, compact=False):
+    """
+    Generator that yields rows from user_data one by one
+
+    On MySQL the whole result set is buffered client-side by default
+    before the first row is yielded. With streaming=True rows are read
+    from an unbuffered cursor as the server sends them, at most
+    `prefetch` rows at a time, so client memory stays flat however
+    large user_data is, and stopping early (break, islice) drops the
+    connection instead of reading the rest of the table. SQLite
+    cursors always step lazily.
+    With compact=True rows are named tuples (see rows.row_type)
+    instead of dicts.
+    """
+    db = backend.get_backend()
     connection = None
     cursor = None
     try:
-        config = get_db_config()
-        connection = mysql.connector.connect(**config)
-        
-        # Use buffered cursor to avoid unread result issues
-        cursor = connection.cursor(buffered=True, dictionary=True)
+        connection = db.connect()
+
+        # Buffered cursor avoids unread result issues; the unbuffered
+        # one keeps only the current fetch in memory
+        cursor = db.cursor(connection, dictionary=not compact, streaming=streaming)
 
         cursor.execute("SELECT * FROM user_data;")
-        
+        rows = _fetch_rows(cursor, prefetch) if streaming else cursor
+
+        if compact:
+            names = db.column_names(cursor)
+            make = row_type(names)._make
+            age = names.index('age')
+            for row in rows:
+                if hasattr(row[age], 'to_integral_value'):
+                    row = row[:age] + (int(row[age]),) + row[age + 1:]
+                yield make(row)
+            return
+
         # Convert age from Decimal to int for cleaner output
-        for row in cursor:
+        for row in rows:
             if 'age' in row and hasattr(row['age'], 'to_integral_value'):
                 row['age'] = int(row['age'])
             yield row
 
-    except mysql.connector.Error as e:
+    except GeneratorExit:
+        # Stopped early: closing the cursor or returning a pooled
+        # MySQL connection would read every remaining row, so the
+        # connection is discarded instead
+        backend.close_early(connection, cursor)
+        cursor = connection = None
+        raise
+    except backend.DB_ERRORS as e:
         print(f"Database error: {e}")
     finally:
         # Properly close resources
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
 # Make the module callable
 import sys
 
 class CallableModule(type(sys)):
-    def __call__(self):
-        return stream_users()
+    def __call__(self, *args, **kwargs):
+        return stream_users(*args, **kwargs)
 
 sys.modules[__name__].__class__ = CallableModule
\ No newline at end of file
@@ -3,60 +3,201 @@
 Batch processing of users from user_data table in ALX_prodev
 """
 
-import mysql.connector
-import os
-from dotenv import load_dotenv
+import time
+from array import array
+from decimal import Decimal
+from itertools import compress
+
+import adaptive
+import backend
+import checkpoint
+import parallel
+from rows import compact_rows
+
+try:
+    import numpy as np
+except ImportError:  # columnar batches fall back to array.array
+    np = None
 
-# Load environment variables from .env file
-load_dotenv()
 
 def get_db_config():
     """Get database configuration from environment variables"""
-    return {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'user': os.getenv('DB_USER', 'root'),
-        'password': os.getenv('DB_PASSWORD', ''),
-        'database': os.getenv('DB_NAME', 'ALX_prodev'),
-        'port': os.getenv('DB_PORT', '3306')
-    }
+    import db_pool
+    return db_pool.get_db_config()
+
+
+def _is_integral(value):
+    """True for ints and for Decimals with no fractional digits"""
+    if isinstance(value, Decimal):
+        return value.as_tuple().exponent >= 0
+    return isinstance(value, int)
+
+
+def to_columns(rows, names):
+    """
+    Turn a list of row tuples into a {column: values} batch.
+    Integer columns (including scale-0 DECIMAL) become int64 NumPy
+    arrays, other numeric columns float64 (array.array 'q' / 'd'
+    without NumPy); the rest stay as sequences of objects.
+    """
+    columns = {}
+    for name, values in zip(names, zip(*rows)):
+        if isinstance(values[0], (int, float, Decimal)):
+            # A DECIMAL column's scale is fixed, so one value decides
+            integral = _is_integral(values[0])
+            if np is not None:
+                columns[name] = np.array(values, dtype=np.int64 if integral else np.float64)
+            elif integral:
+                columns[name] = array('q', map(int, values))
+            else:
+                columns[name] = array('d', map(float, values))
+        elif np is not None:
+            columns[name] = np.array(values, dtype=object)
+        else:
+            columns[name] = list(values)
+    return columns
+
+
+def filter_columns(columns, mask):
+    """Keep the entries of every column where mask is true"""
+    if np is not None:
+        return {name: values[mask] for name, values in columns.items()}
+    mask = list(mask)
+    filtered = {}
+    for name, values in columns.items():
+        kept = compress(values, mask)
+        filtered[name] = array(values.typecode, kept) if isinstance(values, array) else list(kept)
+    return filtered
+
+
+def project_columns(columns, names):
+    """Keep only the named columns of a columnar batch"""
+    return {name: columns[name] for name in names}
 
-def stream_users_in_batches(batch_size):
+
+def over_age(columns, threshold):
+    """Vectorized age > threshold mask for a columnar batch"""
+    ages = columns["age"]
+    if np is not None:
+        return ages > threshold
+    return [age > threshold for age in ages]
+
+
+def stream_users_in_batches(batch_size, columnar=False, compact=False, prefetch_depth=0,
+                            adaptive_sizer=None, raise_errors=False):
     """
-    Generator that yields rows in batches of size batch_size
+    Generator that yields rows in batches of size batch_size.
+    With columnar=True each batch is a {column: array} dict
+    (see to_columns) instead of a list of row dicts; with
+    compact=True it is a list of named tuples (see rows.row_type).
+    prefetch_depth=N fetches up to N batches ahead on a background thread
+    while the caller works on the current one.
+    adaptive_sizer=True (or an adaptive.AdaptiveBatchSizer, to set the
+    latency target and memory budget and read the chosen sizes) tunes
+    the size of every fetch, starting from batch_size. Rows are read
+    from an unbuffered cursor, so only the current batch is held in
+    memory and each fetch really goes to the database.
+    Database errors are printed and end the stream, unless
+    raise_errors=True, for callers that must not mistake a failed
+    scan for the end of the table.
     """
+    if adaptive_sizer is True:
+        adaptive_sizer = adaptive.AdaptiveBatchSizer(initial=batch_size)
+    batches = _fetch_batches(batch_size, columnar, compact, adaptive_sizer, raise_errors)
+    if prefetch_depth:
+        return parallel.prefetch(batches, prefetch_depth)
+    return batches
+
+
+def _fetch_batches(batch_size, columnar, compact, sizer=None, raise_errors=False):
+    db = backend.get_backend()
     connection = None
     cursor = None
     try:
-        config = get_db_config()
-        
-        # Fixed: Proper indentation for multiple with statements
-        with mysql.connector.connect(**config) as connection:
-            with connection.cursor(dictionary=True) as cursor:
-                cursor.execute("SELECT * FROM user_data;")
-                while True:
-                    batch = cursor.fetchmany(batch_size)
-                    if not batch:
-                        break
-                    yield batch
-
-    except mysql.connector.Error as e:
+        # A pooled MySQL connection goes back to the pool on close()
+        connection = db.connect()
+        cursor = db.cursor(connection, dictionary=not (columnar or compact),
+                           streaming=True)
+        cursor.execute("SELECT * FROM user_data;")
+        names = db.column_names(cursor)
+        while True:
+            if sizer is None:
+                batch = cursor.fetchmany(batch_size)
+            else:
+                start = time.perf_counter()
+                batch = cursor.fetchmany(sizer.next_size())
+                sizer.observe(len(batch), time.perf_counter() - start,
+                              batch[0] if batch else None)
+            if not batch:
+                break
+            if columnar:
+                batch = to_columns(batch, names)
+            elif compact:
+                batch = compact_rows(names, batch)
+            yield batch
+
+    except GeneratorExit:
+        # Stopped early: don't read the rest of the result
+        backend.close_early(connection, cursor)
+        cursor = connection = None
+        raise
+    except backend.DB_ERRORS as e:
+        if raise_errors:
+            raise
         print(f"Database error: {e}")
     finally:
-        # The with statements will handle closing, but keep this as backup
-        if cursor and not cursor.close:
+        if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, vectorized=False, job=None, resume=False):
     """
-    Processes each batch and prints users over age 25
+    Processes each batch and prints users over age 25.
+    With vectorized=True the filter runs on columnar batches
+    instead of row by row. Naming a job checkpoints progress
+    (see checkpoint.resumable_pagination); resume=True then
+    continues after the last batch a previous run finished.
+    Checkpointing is not available in vectorized mode.
     """
-    for batch in stream_users_in_batches(batch_size):          # loop 1
+    if vectorized and (job is not None or resume):
+        raise ValueError("job and resume are not supported with vectorized=True")
+    if vectorized:
+        for columns in stream_users_in_batches(batch_size, columnar=True):
+            selected = filter_columns(columns, over_age(columns, 25))
+            names = list(selected)
+            # Plain Python values, so the output matches the row path
+            values_by_column = [values.tolist() if hasattr(values, "tolist") else values
+                                for values in selected.values()]
+            for values in zip(*values_by_column):
+                print(dict(zip(names, values)))
+        return
+
+    if job is not None:
+        batches = checkpoint.resumable_pagination(job, batch_size, resume)
+    else:
+        batches = stream_users_in_batches(batch_size)
+
+    for batch in batches:                                      # loop 1
         for user in batch:                                     # loop 2
             # Convert age from Decimal to int if needed
             age = user["age"]
             if hasattr(age, 'to_integral_value'):
                 age = int(age)
             if age > 25:
-                print(user)
\ No newline at end of file
+                print(user)
+
+
+def process_batches(batch_size, worker, workers=4, executor="thread",
+                    ordered=True, max_pending=None, metrics=None):
+    """
+    Pipeline mode: stream batches into a pool of `workers` threads or
+    processes that run worker(batch), yielding the results.
+    Use executor="process" for CPU-heavy per-user work; see
+    parallel.parallel_map for backpressure, ordering and metrics.
+    """
+    return parallel.parallel_map(
+        stream_users_in_batches(batch_size), worker, workers=workers,
+        executor=executor, max_pending=max_pending, ordered=ordered,
+        metrics=metrics
+    )
@@ -3,28 +3,109 @@
 Lazy pagination of users from user_data table in ALX_prodev
 """
 
-import seed
+import base64
+import json
 
+import backend
 
-def paginate_users(page_size, offset):
-    """Fetch a single page of users starting from offset"""
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+
+def paginate_users(page_size, offset, connection=None):
+    """
+    Fetch a single page of users starting from offset.
+    Uses connection if given, otherwise opens and closes its own.
+    """
+    db = backend.get_backend()
+    own_connection = connection is None
+    if own_connection:
+        connection = db.connect()
+    try:
+        cursor = db.cursor(connection, dictionary=True)
+        cursor.execute(
+            db.sql("SELECT * FROM user_data LIMIT %s OFFSET %s"), (page_size, offset)
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def lazy_pagination(page_size):
+    """
+    Generator that lazily yields pages of users one at a time,
+    over a single connection held until the generator finishes
+    or is closed
+    """
+    connection = backend.connect()
+    offset = 0
+    try:
+        while True:   # ✅ only one loop
+            page = paginate_users(page_size, offset, connection)
+            if not page:
+                break
+            yield page
+            offset += page_size
+    finally:
+        # Also runs on GeneratorExit when the caller stops early
+        connection.close()
+
+
+def encode_cursor(last_seen):
+    """Wrap the last user_id of a page in an opaque, URL-safe token"""
+    payload = json.dumps({"after": last_seen}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(token):
+    """Return the user_id stored in a token made by encode_cursor"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))["after"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {token!r}") from e
+
+
+def page_cursor(page):
+    """Token that resumes keyset_pagination right after page"""
+    return encode_cursor(page[-1]["user_id"])
+
+
+def paginate_users_after(connection, page_size, last_seen=None):
+    """
+    Fetch the page of users whose user_id follows last_seen.
+    The primary key index seeks straight to the page, so every page
+    costs the same however deep into the table it is.
+    """
+    db = backend.get_backend()
+    cursor = db.cursor(connection, dictionary=True)
+    if last_seen is None:
+        cursor.execute(
+            db.sql("SELECT * FROM user_data ORDER BY user_id LIMIT %s"), (page_size,)
+        )
+    else:
+        cursor.execute(
+            db.sql("SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s"),
+            (last_seen, page_size)
+        )
     rows = cursor.fetchall()
     cursor.close()
-    connection.close()
     return rows
 
 
-def lazy_pagination(page_size):
+def keyset_pagination(page_size, cursor=None):
     """
-    Generator that lazily yields pages of users one at a time
+    Generator that lazily yields pages of users in user_id order,
+    seeking past the last user_id seen instead of using OFFSET.
+    Pass a token from page_cursor(page) as cursor to resume after page.
     """
-    offset = 0
-    while True:   # ✅ only one loop
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+    last_seen = decode_cursor(cursor) if cursor else None
+    connection = backend.connect()
+    try:
+        while True:
+            page = paginate_users_after(connection, page_size, last_seen)
+            if not page:
+                break
+            yield page
+            last_seen = page[-1]["user_id"]
+    finally:
+        connection.close()
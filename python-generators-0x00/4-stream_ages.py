@@ -4,21 +4,39 @@ Memory-efficient aggregation using generators:
 Compute average age of users without loading entire dataset
 """
 
-import seed
+import age_stats
+import aggregation
+import backend
+import partitioned_scan
 
 
-def stream_user_ages():
+def stream_user_ages(partitions=1):
     """
-    Generator that yields user ages one by one
+    Generator that yields user ages one by one.
+    With partitions > 1 the table is scanned as that many user_id
+    ranges concurrently (see partitioned_scan) and ages arrive in
+    no particular order.
     """
+    if partitions > 1:
+        for row in partitioned_scan.partitioned_scan(("age",), partitions):
+            yield row["age"]
+        return
+
+    db = backend.get_backend()
     connection = None
     cursor = None
     try:
-        connection = seed.connect_to_prodev()
-        cursor = connection.cursor(dictionary=True)
+        connection = db.connect()
+        # Unbuffered: ages are read as the server sends them
+        cursor = db.cursor(connection, dictionary=True, streaming=True)
         cursor.execute("SELECT age FROM user_data;")
         for row in cursor:   # ✅ loop 1
             yield row["age"]
+    except GeneratorExit:
+        # Stopped early: don't read the rest of the result
+        backend.close_early(connection, cursor)
+        cursor = connection = None
+        raise
     finally:
         if cursor:
             cursor.close()
@@ -26,13 +44,37 @@ def stream_user_ages():
             connection.close()
 
 
-def average_age():
+def age_summary(method="stream", percentiles=(), partitions=1):
+    """
+    count/sum/mean/min/max/variance (and percentiles, 0-100) of ages.
+    method="sql" pushes the aggregation down to the database; method="stream"
+    computes it from stream_user_ages(partitions) in one pass; method="stats"
+    reads the incrementally maintained user_age_stats table (see age_stats).
+    """
+    if method in ("sql", "stats"):
+        connection = backend.connect()
+        try:
+            if method == "stats":
+                return age_stats.summary(connection, percentiles)
+            return aggregation.sql_summary(connection, "age", percentiles=percentiles)
+        finally:
+            connection.close()
+    if method == "stream":
+        return aggregation.summarize(stream_user_ages(partitions), percentiles)
+    raise ValueError(f"Unknown aggregation method: {method!r}")
+
+
+def average_age(method=None, partitions=1):
     """
-    Calculate average age using generator without loading all data
+    Calculate average age using generator without loading all data.
+    Pass method="sql", "stream" or "stats" to go through age_summary instead,
+    and partitions > 1 to scan the table in parallel ranges.
     """
+    if method is not None:
+        return age_summary(method, partitions=partitions)["mean"] or 0
     total = 0
     count = 0
-    for age in stream_user_ages():   # ✅ loop 2
+    for age in stream_user_ages(partitions):   # ✅ loop 2
         total += age
         count += 1
     if count == 0:
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""
+Runtime batch-size tuning for streamed fetches
+"""
+
+import sys
+
+
+def row_bytes(row):
+    """Approximate in-memory size of one fetched row (dict or tuple)"""
+    values = row.values() if isinstance(row, dict) else row
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in values)
+
+
+class AdaptiveBatchSizer:
+    """
+    Picks the next batch size from how the previous fetches went.
+
+    The size is scaled so that one fetch takes about target_latency
+    seconds: small batches on a slow link spend most of their time on
+    per-fetch overhead and grow, batches that take too long shrink.
+    Each step changes the size by at most `max_step`x. With a
+    memory_budget (bytes), the size is also capped so that one batch
+    of rows, at the measured average row size, fits in the budget.
+    The chosen sizes and fetch counters are kept as metrics.
+    """
+
+    def __init__(self, initial=1000, min_size=100, max_size=100_000,
+                 target_latency=0.05, memory_budget=None, max_step=2.0, smoothing=0.3):
+        if not 1 <= min_size <= max_size:
+            raise ValueError("need 1 <= min_size <= max_size")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.memory_budget = memory_budget
+        self.max_step = max_step
+        self.smoothing = smoothing
+        self.sizes = []
+        self.batches = 0
+        self.rows = 0
+        self.fetch_seconds = 0.0
+        self.row_bytes = None
+        self._seconds_per_row = None
+        self.size = self._clamp(initial)
+
+    def _clamp(self, size):
+        if self.memory_budget and self.row_bytes:
+            size = min(size, self.memory_budget // self.row_bytes)
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def _smooth(self, previous, value):
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
+
+    def next_size(self):
+        """The size to request for the next fetch (recorded in sizes)"""
+        self.sizes.append(self.size)
+        return self.size
+
+    def observe(self, rows, seconds, sample=None):
+        """
+        Record a fetch that returned `rows` rows in `seconds`;
+        sample is one of the rows, used to track the row size
+        """
+        self.batches += 1
+        self.rows += rows
+        self.fetch_seconds += seconds
+        if sample is not None:
+            self.row_bytes = int(self._smooth(self.row_bytes, row_bytes(sample)))
+        if not rows:
+            return
+        self._seconds_per_row = self._smooth(self._seconds_per_row, seconds / rows)
+        if self._seconds_per_row > 0:
+            wanted = self.target_latency / self._seconds_per_row
+        else:
+            wanted = self.size * self.max_step
+        wanted = max(self.size / self.max_step, min(self.size * self.max_step, wanted))
+        self.size = self._clamp(wanted)
+
+    @property
+    def mean_size(self):
+        return sum(self.sizes) / len(self.sizes) if self.sizes else 0.0
+
+    def __repr__(self):
+        return (f"AdaptiveBatchSizer(size={self.size}, batches={self.batches}, "
+                f"rows={self.rows}, mean_size={self.mean_size:.0f}, "
+                f"row_bytes={self.row_bytes}, fetch_seconds={self.fetch_seconds:.2f})")
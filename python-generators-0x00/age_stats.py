@@ -0,0 +1,188 @@
+#!/usr/bin/python3
+"""
+Incrementally maintained age statistics for user_data
+
+user_age_stats holds one row per distinct age: how many users have it,
+and the sum and sum of squares of their ages. The loaders update it in
+the same transaction as each chunk they upsert, so mean, variance,
+percentiles and histograms are answered from ~100 rows instead of a
+scan of user_data. check() compares it with the table and rebuild()
+recomputes it from scratch.
+"""
+
+import math
+from collections import Counter
+
+import backend
+
+_UPSERT = {
+    "mysql": (
+        "INSERT INTO user_age_stats (age, users, age_sum, age_squares) VALUES {values} "
+        "ON DUPLICATE KEY UPDATE users = users + VALUES(users), "
+        "age_sum = age_sum + VALUES(age_sum), "
+        "age_squares = age_squares + VALUES(age_squares)"
+    ),
+    "sqlite": (
+        "INSERT INTO user_age_stats (age, users, age_sum, age_squares) VALUES {values} "
+        "ON CONFLICT(age) DO UPDATE SET users = users + excluded.users, "
+        "age_sum = age_sum + excluded.age_sum, "
+        "age_squares = age_squares + excluded.age_squares"
+    ),
+}
+
+_GROUPED = (
+    "SELECT age, COUNT(*), SUM(age), SUM(age * age) FROM user_data GROUP BY age"
+)
+
+
+def create_stats_table(connection):
+    """
+    Create user_age_stats if needed; a new (empty) stats table next
+    to a populated user_data is filled by rebuild()
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_age_stats (
+            age INTEGER PRIMARY KEY,
+            users BIGINT NOT NULL,
+            age_sum BIGINT NOT NULL,
+            age_squares BIGINT NOT NULL
+        )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM user_age_stats")
+    empty = not cursor.fetchone()[0]
+    cursor.execute("SELECT 1 FROM user_data LIMIT 1")
+    populated = cursor.fetchall()
+    connection.commit()
+    cursor.close()
+    if empty and populated:
+        rebuild(connection)
+
+
+def ages_for_emails(cursor, chunk):
+    """
+    {user_id: age} of the stored rows matching the emails of a chunk
+    of (user_id, name, email, age) rows. The IN lookup compares emails
+    with the table's collation, like the unique index the upsert hits,
+    so it finds exactly the rows the upsert will touch.
+    """
+    emails = list({email for _, _, email, _ in chunk})
+    db = backend.get_backend()
+    placeholders = ", ".join(["%s"] * len(emails))
+    cursor.execute(
+        db.sql(f"SELECT user_id, age FROM user_data WHERE email IN ({placeholders})"),
+        emails
+    )
+    return {user_id: int(age) for user_id, age in cursor.fetchall()}
+
+
+def record_upsert(cursor, chunk, before):
+    """
+    Fold an upserted chunk into the stats: before is
+    ages_for_emails(cursor, chunk) taken just before the upsert, in the
+    same transaction. The deltas come from the rows as stored before
+    and after, so emails the index treats as equal (e.g. differing
+    only in case under MySQL's default collation) count once.
+    """
+    after = ages_for_emails(cursor, chunk)
+    deltas = Counter(after.values())
+    deltas.subtract(before.values())
+    apply_deltas(cursor, deltas)
+
+
+def apply_deltas(cursor, deltas):
+    """Add {age: change in user count} to the stats in one statement"""
+    deltas = {age: change for age, change in deltas.items() if change}
+    if not deltas:
+        return
+    db = backend.get_backend()
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(deltas))
+    params = []
+    for age, change in deltas.items():
+        params += (age, change, change * age, change * age * age)
+    cursor.execute(db.sql(_UPSERT[db.name].format(values=values)), params)
+    cursor.execute("DELETE FROM user_age_stats WHERE users = 0")
+
+
+def rebuild(connection):
+    """Recompute the stats from user_data with one grouped scan"""
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM user_age_stats")
+    cursor.execute(
+        "INSERT INTO user_age_stats (age, users, age_sum, age_squares) " + _GROUPED
+    )
+    connection.commit()
+    cursor.close()
+
+
+def check(connection, repair=False):
+    """
+    Compare the stats with user_data. Returns a list of
+    (age, stored, actual) for every age whose (users, age_sum,
+    age_squares) differ; with repair=True a mismatch triggers rebuild().
+    """
+    stored = _buckets(connection)
+    cursor = connection.cursor()
+    cursor.execute(_GROUPED)
+    actual = {int(age): (users, int(total), int(squares))
+              for age, users, total, squares in cursor.fetchall()}
+    cursor.close()
+    mismatches = [
+        (age, stored.get(age), actual.get(age))
+        for age in sorted(set(stored) | set(actual))
+        if stored.get(age) != actual.get(age)
+    ]
+    if mismatches and repair:
+        rebuild(connection)
+    return mismatches
+
+
+def _buckets(connection):
+    """{age: (users, age_sum, age_squares)}"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT age, users, age_sum, age_squares FROM user_age_stats")
+    buckets = {int(age): (users, int(total), int(squares))
+               for age, users, total, squares in cursor.fetchall()}
+    cursor.close()
+    return buckets
+
+
+def summary(connection, percentiles=()):
+    """
+    The aggregation.summarize keys (count/sum/mean/min/max/variance and
+    percentiles, 0-100) read from the stats table. Percentiles are
+    exact nearest-rank values, since the stats hold every age's count.
+    """
+    buckets = sorted(_buckets(connection).items())
+    count = sum(users for _, (users, _, _) in buckets)
+    total = sum(age_sum for _, (_, age_sum, _) in buckets)
+    squares = sum(age_squares for _, (_, _, age_squares) in buckets)
+    result = {
+        "count": count,
+        "sum": float(total),
+        "mean": total / count if count else None,
+        "min": float(buckets[0][0]) if buckets else None,
+        "max": float(buckets[-1][0]) if buckets else None,
+        # Integer sums, so this has none of the usual cancellation error
+        "variance": (count * squares - total * total) / (count * count) if count else 0.0,
+    }
+    for p in percentiles:
+        value = None
+        if count:
+            rank = max(1, math.ceil(p / 100 * count))
+            seen = 0
+            for age, (users, _, _) in buckets:
+                seen += users
+                if seen >= rank:
+                    value = float(age)
+                    break
+        result[f"p{p:g}"] = value
+    return result
+
+
+def histogram(connection, width=10):
+    """{bucket start: users} for age buckets of the given width"""
+    counts = Counter()
+    for age, (users, _, _) in _buckets(connection).items():
+        counts[age - age % width] += users
+    return dict(sorted(counts.items()))
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+"""
+Aggregations over user_data columns, either pushed down to SQL or
+computed from a generator in a single streaming pass
+"""
+
+import math
+
+import backend
+
+# Columns that may be aggregated server-side (interpolated into SQL)
+NUMERIC_COLUMNS = ("age",)
+
+
+class RunningStats:
+    """
+    Single-pass count/sum/mean/min/max/variance accumulator.
+    Variance uses Welford's update, which stays accurate where the
+    naive sum-of-squares formula cancels catastrophically.
+    """
+
+    __slots__ = ("count", "total", "mean", "min", "max", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self._m2 = 0.0
+
+    def add(self, value):
+        """Fold one value into the statistics"""
+        value = float(value)
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Combine with statistics accumulated over another stream"""
+        if not other.count:
+            return self
+        if not self.count:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance (0 for fewer than two values)"""
+        return self._m2 / self.count if self.count > 1 else 0.0
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch in the style of a merging t-digest.
+
+    Values are buffered and periodically merged into weighted
+    centroids; the k1 scale function keeps centroids small near the
+    tails, so extreme percentiles stay accurate while memory is
+    bounded by roughly `compression` centroids.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._centroids = []
+        self._buffer = []
+
+    def add(self, value, weight=1):
+        """Add one value (with an optional weight) to the sketch"""
+        value = float(value)
+        self._buffer.append((value, weight))
+        self.count += weight
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        for mean, weight in other._centroids + other._buffer:
+            self.add(mean, weight)
+        return self
+
+    def _scale(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * min(q, 1.0) - 1)
+
+    def _compress(self):
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        if not items:
+            return
+        merged = []
+        before = 0.0
+        mean, weight = items[0]
+        for value, w in items[1:]:
+            if (self._scale((before + weight + w) / self.count)
+                    - self._scale(before / self.count)) <= 1:
+                weight += w
+                mean += (value - mean) * w / weight
+            else:
+                merged.append((mean, weight))
+                before += weight
+                mean, weight = value, w
+        merged.append((mean, weight))
+        self._centroids = merged
+
+    def quantile(self, q):
+        """Estimate the q-th quantile, 0 <= q <= 1"""
+        if not 0 <= q <= 1:
+            raise ValueError(f"quantile must be between 0 and 1, got {q}")
+        self._compress()
+        if not self._centroids:
+            return None
+        target = q * self.count
+        previous_center, previous_mean = 0.0, self.min
+        before = 0.0
+        for mean, weight in self._centroids:
+            center = before + weight / 2
+            if target <= center:
+                span = center - previous_center
+                if span <= 0:
+                    return mean
+                fraction = (target - previous_center) / span
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_center, previous_mean = center, mean
+            before += weight
+        span = self.count - previous_center
+        fraction = (target - previous_center) / span if span > 0 else 1.0
+        return previous_mean + fraction * (self.max - previous_mean)
+
+
+def _percentile_key(p):
+    return f"p{p:g}"
+
+
+def summarize(values, percentiles=(), compression=100):
+    """
+    Summarize an iterable of numbers in one pass with O(1) memory
+    (plus the bounded quantile sketch when percentiles are asked for).
+    Percentiles are given on a 0-100 scale.
+    """
+    stats = RunningStats()
+    sketch = QuantileSketch(compression) if percentiles else None
+    for value in values:
+        stats.add(value)
+        if sketch is not None:
+            sketch.add(value)
+    result = {
+        "count": stats.count,
+        "sum": stats.total,
+        "mean": stats.mean if stats.count else None,
+        "min": stats.min,
+        "max": stats.max,
+        "variance": stats.variance,
+    }
+    for p in percentiles:
+        result[_percentile_key(p)] = sketch.quantile(p / 100)
+    return result
+
+
+def sql_summary(connection, column="age", table="user_data", percentiles=()):
+    """
+    Compute the same summary with the aggregation pushed down to SQL.
+    Percentiles use the nearest-rank method, one ordered seek each.
+    """
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f"Cannot aggregate column {column!r}")
+    db = backend.get_backend()
+    cursor = connection.cursor()
+    if db.name == "sqlite":
+        # SQLite has no VAR_POP; fall back to the mean of squares
+        variance_sql = f"AVG({column} * {column}) - AVG({column}) * AVG({column})"
+    else:
+        variance_sql = f"VAR_POP({column})"
+    cursor.execute(
+        f"SELECT COUNT({column}), SUM({column}), AVG({column}), "
+        f"MIN({column}), MAX({column}), {variance_sql} FROM {table}"
+    )
+    count, total, mean, low, high, variance = cursor.fetchone()
+    result = {
+        "count": count,
+        "sum": float(total) if total is not None else 0.0,
+        "mean": float(mean) if mean is not None else None,
+        "min": float(low) if low is not None else None,
+        "max": float(high) if high is not None else None,
+        "variance": max(0.0, float(variance)) if variance is not None else 0.0,
+    }
+    for p in percentiles:
+        value = None
+        if count:
+            rank = max(1, math.ceil(p / 100 * count))
+            cursor.execute(
+                db.sql(f"SELECT {column} FROM {table} ORDER BY {column} LIMIT 1 OFFSET %s"),
+                (rank - 1,)
+            )
+            value = float(cursor.fetchone()[0])
+        result[_percentile_key(p)] = value
+    cursor.close()
+    return result
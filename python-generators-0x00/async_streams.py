@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""
+Async generator equivalents of the user_data generators
+
+The blocking generators run on a private worker thread per stream and
+hand rows to the event loop in chunks, so `async for` never blocks
+the loop on the MySQL driver.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_pagination = __import__('2-lazy_paginate').lazy_pagination
+
+
+async def aiterate(factory, *args, chunk_size=1, **kwargs):
+    """
+    Async generator over the items of factory(*args, **kwargs).
+
+    The generator is created and advanced on one dedicated thread
+    (connections stay on the thread that opened them), chunk_size
+    items per hop to amortize the thread handoff.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    generator = await loop.run_in_executor(executor, lambda: factory(*args, **kwargs))
+    try:
+        while True:
+            items = await loop.run_in_executor(
+                executor, lambda: list(islice(generator, chunk_size))
+            )
+            if not items:
+                break
+            for item in items:
+                yield item
+    finally:
+        # Runs the generator's own cleanup (closing its connection)
+        await loop.run_in_executor(executor, generator.close)
+        executor.shutdown(wait=False)
+
+
+def astream_users(chunk_size=500, streaming=True, prefetch=1000):
+    """Async generator that yields rows from user_data one by one"""
+    return aiterate(stream_users, streaming=streaming, prefetch=prefetch,
+                    chunk_size=chunk_size)
+
+
+def astream_users_in_batches(batch_size):
+    """Async generator that yields rows in batches of size batch_size"""
+    return aiterate(stream_users_in_batches, batch_size)
+
+
+def alazy_pagination(page_size):
+    """Async generator that lazily yields pages of users"""
+    return aiterate(lazy_pagination, page_size)
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+"""
+Database backends for the user_data generators
+
+The generator modules get connections and cursors from the active
+backend instead of talking to mysql.connector directly, so the same
+code runs against MySQL (ALX_prodev) or a local SQLite file.
+Select one with DB_BACKEND=mysql|sqlite (default mysql) or set_backend().
+"""
+
+import os
+import sqlite3
+import threading
+
+try:
+    import mysql.connector
+    DB_ERRORS = (sqlite3.Error, mysql.connector.Error)
+except ImportError:  # the SQLite backend works without the MySQL driver
+    DB_ERRORS = (sqlite3.Error,)
+
+USER_COLUMNS = ("user_id", "name", "email", "age")
+
+
+class MySQLBackend:
+    """ALX_prodev on MySQL, through the shared connection pool"""
+
+    name = "mysql"
+
+    def connect(self):
+        import db_pool
+        return db_pool.connect()
+
+    def cursor(self, connection, dictionary=False, streaming=False):
+        """
+        Cursor returning dicts or tuples. streaming=True gives an
+        unbuffered cursor that reads rows as the server sends them.
+        """
+        return connection.cursor(dictionary=dictionary, buffered=not streaming)
+
+    def sql(self, query):
+        return query
+
+    def column_names(self, cursor):
+        return tuple(cursor.column_names)
+
+    def connections_opened(self):
+        import db_pool
+        return db_pool.get_pool().stats["created"]
+
+    def create_table(self, connection):
+        import seed
+        seed.create_table(connection)
+
+    def truncate(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("TRUNCATE TABLE user_data")
+        cursor.execute("DELETE FROM user_age_stats")
+        connection.commit()
+        cursor.close()
+
+    def load_users(self, connection, csv_file, chunk_size=5000):
+        import seed
+        return seed.bulk_insert_data(connection, csv_file, chunk_size=chunk_size)
+
+
+class SQLiteBackend:
+    """
+    user_data in a local SQLite file (SQLITE_PATH, default
+    ALX_prodev.sqlite3). Connections use WAL so readers never block
+    the loader, and cursors fetch `arraysize` rows per step.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=None, arraysize=1000):
+        self.path = path or os.getenv('SQLITE_PATH', 'ALX_prodev.sqlite3')
+        self.arraysize = arraysize
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._opened += 1
+        return connection
+
+    def cursor(self, connection, dictionary=False, streaming=False):
+        """
+        Cursor returning dicts or tuples. SQLite cursors always step
+        through results lazily, so streaming needs no special mode.
+        """
+        cursor = connection.cursor()
+        cursor.arraysize = self.arraysize
+        if dictionary:
+            cursor.row_factory = _dict_row_factory()
+        return cursor
+
+    def sql(self, query):
+        return query.replace("%s", "?")
+
+    def column_names(self, cursor):
+        return tuple(column[0] for column in cursor.description)
+
+    def connections_opened(self):
+        return self._opened
+
+    def create_table(self, connection):
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS user_data (
+                user_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                age INTEGER NOT NULL
+            )
+        """)
+        connection.commit()
+        import age_stats
+        age_stats.create_stats_table(connection)
+
+    def truncate(self, connection):
+        connection.execute("DELETE FROM user_data")
+        connection.execute("DELETE FROM user_age_stats")
+        connection.commit()
+
+    def load_users(self, connection, csv_file, chunk_size=5000):
+        """
+        Upsert a user_data CSV, one executemany per chunk, keeping
+        user_age_stats up to date in the same transaction
+        """
+        import age_stats
+        import csv_ingest
+        processed = 0
+        cursor = connection.cursor()
+        for chunk in csv_ingest.iter_user_chunks(csv_file, chunk_size):
+            before = age_stats.ages_for_emails(cursor, chunk)
+            cursor.executemany(
+                "INSERT INTO user_data (user_id, name, email, age) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(email) DO UPDATE SET name = excluded.name, age = excluded.age",
+                chunk
+            )
+            age_stats.record_upsert(cursor, chunk, before)
+            connection.commit()
+            processed += len(chunk)
+        cursor.close()
+        return processed
+
+
+def _dict_row_factory():
+    """Row factory building dicts, reading column names once per query"""
+    last = [None, None]
+
+    def factory(cursor, row):
+        if cursor.description is not last[0]:
+            last[0] = cursor.description
+            last[1] = tuple(column[0] for column in cursor.description)
+        return dict(zip(last[1], row))
+    return factory
+
+
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "sqlite": SQLiteBackend,
+}
+_active = None
+
+
+def set_backend(backend):
+    """Make backend (a name or a backend instance) the active one"""
+    global _active
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend!r}")
+        backend = BACKENDS[backend]()
+    _active = backend
+    return backend
+
+
+def get_backend():
+    """The active backend, chosen from DB_BACKEND on first use"""
+    if _active is None:
+        return set_backend(os.getenv('DB_BACKEND', 'mysql'))
+    return _active
+
+
+def connect():
+    """A connection from the active backend"""
+    return get_backend().connect()
+
+
+def close_early(connection, cursor=None):
+    """
+    Close a cursor and its connection before the result was read to
+    the end. A pooled MySQL connection is discarded first, so closing
+    the cursor does not read every remaining row (consume_results).
+    """
+    discard = getattr(connection, "discard", None)
+    if discard is not None:
+        discard()
+    try:
+        if cursor is not None:
+            cursor.close()
+    except DB_ERRORS:
+        # The dropped connection cannot answer; nothing is left to free
+        pass
+    connection.close()
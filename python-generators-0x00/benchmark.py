@@ -0,0 +1,578 @@
+#!/usr/bin/python3
+"""
+Benchmarks for the python-generators-0x00 modules
+
+Run against a scratch database (MySQL ALX_prodev, or a local SQLite
+file with --backend sqlite), e.g.:
+    python3 benchmark.py seed --sizes 10000 100000 1000000
+    python3 benchmark.py stream-memory --sizes 10000 1000000 5000000
+    python3 benchmark.py paginate --rows 1000000 --page-size 100
+    python3 benchmark.py aggregate --rows 1000000
+    python3 benchmark.py async --rows 100000 --streams 1 4 16
+    python3 benchmark.py row-memory --batch-sizes 1000 10000 100000
+    python3 benchmark.py parse --size-mb 2048
+    python3 benchmark.py suite --sizes 10000 1000000 10000000 --output results.json
+    python3 benchmark.py --backend sqlite suite --sizes 10000 100000
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import adaptive
+import backend
+import csv_ingest
+
+
+def write_users_csv(path, rows, duplicate_ratio=0.0):
+    """Write a synthetic user_data CSV with `rows` rows"""
+    unique = max(1, int(rows * (1 - duplicate_ratio)))
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writerow(["name", "email", "age"])
+        for i in range(rows):
+            n = i if i < unique else random.randrange(unique)
+            writer.writerow([f"User {n}", f"user{n}@example.com", random.randint(1, 120)])
+
+
+def open_table():
+    """Connection to the active backend, with user_data created"""
+    connection = backend.connect()
+    backend.get_backend().create_table(connection)
+    return connection
+
+
+def reset_table(connection):
+    """Empty user_data so each run starts from the same state"""
+    backend.get_backend().truncate(connection)
+
+
+def seed_users(connection, rows, chunk_size=10000):
+    """Replace the contents of user_data with `rows` synthetic users"""
+    reset_table(connection)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.csv")
+        write_users_csv(path, rows)
+        backend.get_backend().load_users(connection, path, chunk_size=chunk_size)
+
+
+def _peak_rss_kb():
+    """Peak resident set size of this process in KiB"""
+    try:
+        # VmHWM belongs to this process image only; ru_maxrss also
+        # carries the parent's peak over fork+exec
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if os.uname().sysname == "Darwin" else peak
+
+
+def _run_isolated(target, *args):
+    """
+    Run target(*args, queue) in a freshly spawned process and return
+    what it puts on the queue. Spawning (not forking) keeps the child
+    from inheriting this process's pooled connections and memory peak.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    worker = context.Process(target=target, args=args + (queue,))
+    worker.start()
+    result = queue.get()
+    worker.join()
+    return result
+
+
+def _drain_stream(streaming, results):
+    """Consume stream_users in a fresh process and report its peak RSS"""
+    stream_users = __import__('0-stream_users').stream_users
+    baseline = _peak_rss_kb()
+    rows = sum(1 for _ in stream_users(streaming=streaming))
+    results.put((rows, _peak_rss_kb() - baseline))
+
+
+def bench_stream_memory(sizes, tolerance_kb=16 * 1024):
+    """
+    Measure peak RSS growth of stream_users, buffered vs streaming,
+    as user_data grows. Each run happens in its own process so peaks
+    from one run cannot hide another. Returns False if the streaming
+    mode grew by more than tolerance_kb from the smallest to the
+    largest table.
+    """
+    connection = open_table()
+    results = []
+    for size in sizes:
+        seed_users(connection, size)
+        for streaming in (False, True):
+            rows, rss = _run_isolated(_drain_stream, streaming)
+            results.append((size, "streaming" if streaming else "buffered", rows, rss))
+    connection.close()
+
+    print(f"{'rows':>10} {'mode':>10} {'peak RSS growth (KiB)':>22}")
+    for size, mode, rows, rss in results:
+        print(f"{rows:>10} {mode:>10} {rss:>22}")
+
+    streamed = [rss for _, mode, _, rss in results if mode == "streaming"]
+    flat = max(streamed) - min(streamed) <= tolerance_kb
+    print(f"streaming peak RSS {'flat' if flat else 'GREW'} across sizes")
+    return flat
+
+
+def _walk(pages):
+    """Consume a page generator; return (pages, seconds, slowest page)"""
+    count = 0
+    slowest = 0.0
+    start = last = time.perf_counter()
+    for _ in pages:
+        now = time.perf_counter()
+        slowest = max(slowest, now - last)
+        count += 1
+        last = now
+    return count, time.perf_counter() - start, slowest
+
+
+def bench_paginate(rows, page_size):
+    """Walk the whole table with OFFSET and with keyset pagination"""
+    paginate = __import__('2-lazy_paginate')
+    connection = open_table()
+    seed_users(connection, rows)
+    connection.close()
+
+    print(f"{'engine':>8} {'pages':>8} {'seconds':>10} {'slowest page (ms)':>18}")
+    results = {}
+    for name, pages in (("offset", paginate.lazy_pagination(page_size)),
+                        ("keyset", paginate.keyset_pagination(page_size))):
+        count, elapsed, slowest = _walk(pages)
+        results[name] = elapsed
+        print(f"{name:>8} {count:>8} {elapsed:>10.2f} {slowest * 1000:>18.1f}")
+    return results
+
+
+def bench_aggregate(rows, percentiles=(50, 90, 99)):
+    """
+    Time age_summary pushed down to SQL, from the streaming
+    accumulator and from the maintained stats table
+    """
+    stream_ages = __import__('4-stream_ages')
+    connection = open_table()
+    seed_users(connection, rows)
+    connection.close()
+
+    results = {}
+    for method in ("sql", "stream", "stats"):
+        start = time.perf_counter()
+        summary = stream_ages.age_summary(method, percentiles)
+        results[method] = (time.perf_counter() - start, summary)
+
+    print(f"{'method':>8} {'seconds':>10} {'mean':>8} " +
+          " ".join(f"{'p' + str(p):>8}" for p in percentiles))
+    for method, (elapsed, summary) in results.items():
+        print(f"{method:>8} {elapsed:>10.2f} {summary['mean']:>8.2f} " +
+              " ".join(f"{summary[f'p{p:g}']:>8.2f}" for p in percentiles))
+    return results
+
+
+def bench_prefetch(rows, batch_size, work_ms, depths):
+    """
+    Drain stream_users_in_batches with a simulated per-batch workload
+    of work_ms milliseconds, without and with prefetching
+    """
+    batch_processing = __import__('1-batch_processing')
+    connection = open_table()
+    seed_users(connection, rows)
+    connection.close()
+
+    print(f"{'depth':>6} {'batches':>8} {'seconds':>10} {'rows/sec':>10} {'speedup':>8}")
+    results = {}
+    for depth in [0] + [d for d in depths if d]:
+        start = time.perf_counter()
+        batches = count = 0
+        for batch in batch_processing.stream_users_in_batches(batch_size, prefetch_depth=depth):
+            time.sleep(work_ms / 1000)
+            batches += 1
+            count += len(batch)
+        elapsed = time.perf_counter() - start
+        results[depth] = elapsed
+        print(f"{depth:>6} {batches:>8} {elapsed:>10.2f} {count / elapsed:>10.0f} "
+              f"{results[0] / elapsed:>7.2f}x")
+    return results
+
+
+def bench_adaptive(rows, batch_sizes, target_ms, memory_budget_kb=None):
+    """
+    Drain stream_users_in_batches at fixed batch sizes and with the
+    adaptive sizer, reporting rows/sec and the sizes it settled on
+    """
+    batch_processing = __import__('1-batch_processing')
+    connection = open_table()
+    seed_users(connection, rows)
+    connection.close()
+
+    print(f"{'mode':>10} {'batches':>8} {'rows/sec':>10} {'size min/mean/max':>22}")
+    results = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        batches = [len(batch) for batch in batch_processing.stream_users_in_batches(batch_size)]
+        elapsed = time.perf_counter() - start
+        results[batch_size] = sum(batches) / elapsed
+        print(f"{batch_size:>10} {len(batches):>8} {results[batch_size]:>10.0f} "
+              f"{batch_size:>22}")
+
+    sizer = adaptive.AdaptiveBatchSizer(
+        initial=min(batch_sizes), target_latency=target_ms / 1000,
+        memory_budget=memory_budget_kb * 1024 if memory_budget_kb else None)
+    start = time.perf_counter()
+    count = sum(len(batch) for batch in
+                batch_processing.stream_users_in_batches(sizer.size, adaptive_sizer=sizer))
+    elapsed = time.perf_counter() - start
+    results["adaptive"] = count / elapsed
+    sizes = f"{min(sizer.sizes)}/{sizer.mean_size:.0f}/{max(sizer.sizes)}"
+    print(f"{'adaptive':>10} {sizer.batches - 1:>8} {results['adaptive']:>10.0f} {sizes:>22}")
+    print(sizer)
+    return results
+
+
+async def _concurrent_streams(streams):
+    """Drain `streams` astream_users concurrently, watching loop lag"""
+    import async_streams
+
+    async def drain():
+        count = 0
+        async for _ in async_streams.astream_users():
+            count += 1
+        return count
+
+    worst_lag = 0.0
+    done = asyncio.Event()
+
+    async def heartbeat(interval=0.01):
+        nonlocal worst_lag
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            worst_lag = max(worst_lag, time.perf_counter() - start - interval)
+
+    beat = asyncio.create_task(heartbeat())
+    counts = await asyncio.gather(*(drain() for _ in range(streams)))
+    done.set()
+    await beat
+    return sum(counts), worst_lag
+
+
+def bench_async(rows, stream_counts):
+    """
+    Rows/sec of N concurrent astream_users, and the worst event-loop
+    stall seen meanwhile (stays near zero if nothing blocks the loop)
+    """
+    connection = open_table()
+    seed_users(connection, rows)
+    connection.close()
+
+    print(f"{'streams':>8} {'rows':>10} {'seconds':>10} {'rows/sec':>12} {'max loop lag (ms)':>18}")
+    results = []
+    for streams in stream_counts:
+        start = time.perf_counter()
+        total, lag = asyncio.run(_concurrent_streams(streams))
+        elapsed = time.perf_counter() - start
+        results.append((streams, total, elapsed, lag))
+        print(f"{streams:>8} {total:>10} {elapsed:>10.2f} {total / elapsed:>12.0f} {lag * 1000:>18.1f}")
+    return results
+
+
+def bench_row_memory(batch_sizes):
+    """
+    Bytes held by one batch of dict rows vs compact rows.
+    Needs no database: rows are built the way the cursor builds them.
+    """
+    from rows import row_type
+
+    names = ("user_id", "name", "email", "age")
+    UserRow = row_type(names)
+    print(f"{'batch':>8} {'dict bytes/row':>15} {'compact bytes/row':>18} {'saved':>7}")
+    results = []
+    for size in batch_sizes:
+        values = [(str(uuid.uuid4()), f"User {i}", f"user{i}@example.com", i % 120)
+                  for i in range(size)]
+        usage = {}
+        for label, build in (("dict", lambda v: dict(zip(names, v))),
+                             ("compact", UserRow._make)):
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            batch = [build(v) for v in values]
+            usage[label] = (tracemalloc.get_traced_memory()[0] - before) / size
+            tracemalloc.stop()
+            del batch
+        saved = 1 - usage["compact"] / usage["dict"]
+        results.append((size, usage["dict"], usage["compact"]))
+        print(f"{size:>8} {usage['dict']:>15.0f} {usage['compact']:>18.0f} {saved:>7.0%}")
+    return results
+
+
+def _dictreader_rows(path):
+    """The old insert_data parse: a dict per line, age left as str"""
+    with open(path, "r", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            yield (str(uuid.uuid4()), row["name"], row["email"], row["age"])
+
+
+def bench_parse(size_mb=None, path=None, chunk_size=5000):
+    """
+    CSV parse throughput in MB/s: csv.DictReader with per-row uuid4
+    vs csv_ingest.iter_user_chunks. Without a path, a synthetic file
+    of about size_mb megabytes is generated first (no database needed).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        if path is None:
+            path = os.path.join(tmp, "users.csv")
+            # a synthetic row is about 45 bytes
+            write_users_csv(path, int(size_mb * 1024 * 1024 / 45))
+        megabytes = os.path.getsize(path) / (1024 * 1024)
+
+        results = {}
+        start = time.perf_counter()
+        rows = sum(1 for _ in _dictreader_rows(path))
+        results["dictreader"] = (rows, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rows = sum(len(chunk) for chunk in csv_ingest.iter_user_chunks(path, chunk_size))
+        results["chunked"] = (rows, time.perf_counter() - start)
+
+    print(f"{'parser':>11} {'rows':>10} {'seconds':>10} {'MB/s':>8}")
+    for name, (rows, elapsed) in results.items():
+        print(f"{name:>11} {rows:>10} {elapsed:>10.2f} {megabytes / elapsed:>8.1f}")
+    return results
+
+
+def bench_seed(sizes, chunk_size=5000):
+    """
+    Time the backend's CSV loader (seed.bulk_insert_data on MySQL)
+    on an empty table (cold load) and again on the loaded table
+    (every row hits the unique email index)
+    """
+    connection = open_table()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"users_{size}.csv")
+            write_users_csv(path, size)
+            reset_table(connection)
+            for label in ("cold", "upsert"):
+                start = time.perf_counter()
+                backend.get_backend().load_users(connection, path, chunk_size=chunk_size)
+                elapsed = time.perf_counter() - start
+                results.append((size, label, elapsed))
+    connection.close()
+
+    print(f"{'rows':>10} {'pass':>8} {'seconds':>10} {'rows/sec':>12}")
+    for size, label, elapsed in results:
+        print(f"{size:>10} {label:>8} {elapsed:>10.2f} {size / elapsed:>12.0f}")
+    return results
+
+
+WORKLOADS = (
+    "stream_users",
+    "stream_users_streaming",
+    "stream_users_in_batches",
+    "stream_users_in_batches_prefetch",
+    "lazy_pagination",
+    "keyset_pagination",
+    "average_age",
+)
+BATCHED_WORKLOADS = {"stream_users_in_batches", "stream_users_in_batches_prefetch",
+                     "lazy_pagination", "keyset_pagination"}
+
+
+def _workload(name, batch_size):
+    """The generator behind a suite workload name"""
+    if name == "stream_users":
+        return __import__('0-stream_users').stream_users()
+    if name == "stream_users_streaming":
+        return __import__('0-stream_users').stream_users(streaming=True)
+    if name == "stream_users_in_batches":
+        return __import__('1-batch_processing').stream_users_in_batches(batch_size)
+    if name == "stream_users_in_batches_prefetch":
+        return __import__('1-batch_processing').stream_users_in_batches(
+            batch_size, prefetch_depth=2)
+    if name == "lazy_pagination":
+        return __import__('2-lazy_paginate').lazy_pagination(batch_size)
+    if name == "keyset_pagination":
+        return __import__('2-lazy_paginate').keyset_pagination(batch_size)
+    if name == "average_age":
+        # average_age is a fold over this generator
+        return __import__('4-stream_ages').stream_user_ages()
+    raise ValueError(f"Unknown workload: {name!r}")
+
+
+def _measure_workload(name, batch_size, results):
+    """Drain one workload in a fresh process and report its metrics"""
+    try:
+        # Generators run nothing until iterated; creating one first
+        # keeps module imports out of the measurements
+        items = _workload(name, batch_size)
+        batched = name in BATCHED_WORKLOADS
+        first_row = None
+        rows = 0
+        baseline = _peak_rss_kb()
+        start = time.perf_counter()
+        for item in items:
+            if first_row is None:
+                first_row = time.perf_counter() - start
+            rows += len(item) if batched else 1
+        elapsed = time.perf_counter() - start
+        results.put({
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed else 0.0,
+            "time_to_first_row": first_row,
+            "peak_rss_kb": _peak_rss_kb(),
+            "rss_growth_kb": _peak_rss_kb() - baseline,
+            "connections_opened": backend.get_backend().connections_opened(),
+        })
+    except Exception as e:
+        results.put({"error": repr(e)})
+
+
+def bench_suite(sizes, batch_sizes, workloads=WORKLOADS, output=None):
+    """
+    Seed user_data at each size and measure every workload (and every
+    batch size for batched ones): rows/sec, time to first row, peak
+    RSS and connections opened, each in its own process. Results are
+    printed and, with output, written as JSON for regression tracking.
+    """
+    connection = open_table()
+    records = []
+    print(f"{'table rows':>10} {'workload':>32} {'batch':>6} {'rows/sec':>10} "
+          f"{'first row (ms)':>15} {'peak RSS (KiB)':>15} {'conns':>6}")
+    for size in sizes:
+        seed_users(connection, size)
+        for name in workloads:
+            for batch_size in (batch_sizes if name in BATCHED_WORKLOADS else [None]):
+                metrics = _run_isolated(_measure_workload, name, batch_size)
+                record = {"table_rows": size, "workload": name, "batch_size": batch_size}
+                record.update(metrics)
+                records.append(record)
+                if "error" in metrics:
+                    print(f"{size:>10} {name:>32} {batch_size or '-':>6} error: {metrics['error']}")
+                    continue
+                first_row = (metrics["time_to_first_row"] or 0) * 1000
+                print(f"{size:>10} {name:>32} {batch_size or '-':>6} "
+                      f"{metrics['rows_per_sec']:>10.0f} {first_row:>15.1f} "
+                      f"{metrics['peak_rss_kb']:>15} {metrics['connections_opened']:>6}")
+    connection.close()
+
+    if output:
+        report = {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "backend": backend.get_backend().name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": records,
+        }
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=sorted(backend.BACKENDS),
+                        default=os.getenv('DB_BACKEND', 'mysql'))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="seed time by table size")
+    seed_parser.add_argument("--sizes", type=int, nargs="+",
+                             default=[10_000, 100_000, 1_000_000])
+    seed_parser.add_argument("--chunk-size", type=int, default=5000)
+
+    memory_parser = commands.add_parser("stream-memory",
+                                        help="stream_users peak RSS by table size")
+    memory_parser.add_argument("--sizes", type=int, nargs="+",
+                               default=[10_000, 1_000_000, 5_000_000])
+
+    paginate_parser = commands.add_parser("paginate",
+                                          help="OFFSET vs keyset pagination")
+    paginate_parser.add_argument("--rows", type=int, default=1_000_000)
+    paginate_parser.add_argument("--page-size", type=int, default=100)
+
+    aggregate_parser = commands.add_parser("aggregate",
+                                           help="SQL push-down vs streaming aggregation")
+    aggregate_parser.add_argument("--rows", type=int, default=1_000_000)
+
+    prefetch_parser = commands.add_parser("prefetch",
+                                          help="batch prefetching vs fetch-then-process")
+    prefetch_parser.add_argument("--rows", type=int, default=100_000)
+    prefetch_parser.add_argument("--batch-size", type=int, default=1000)
+    prefetch_parser.add_argument("--work-ms", type=float, default=5.0,
+                                 help="simulated processing time per batch")
+    prefetch_parser.add_argument("--depths", type=int, nargs="+", default=[1, 2, 4])
+
+    adaptive_parser = commands.add_parser("adaptive", help="fixed vs adaptive batch sizes")
+    adaptive_parser.add_argument("--rows", type=int, default=1_000_000)
+    adaptive_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 10_000])
+    adaptive_parser.add_argument("--target-ms", type=float, default=50.0,
+                                 help="fetch latency the adaptive sizer aims for")
+    adaptive_parser.add_argument("--memory-budget-kb", type=int,
+                                 help="cap on the memory of one adaptive batch")
+
+    async_parser = commands.add_parser("async", help="concurrent async streams")
+    async_parser.add_argument("--rows", type=int, default=100_000)
+    async_parser.add_argument("--streams", type=int, nargs="+", default=[1, 4, 16])
+
+    row_parser = commands.add_parser("row-memory", help="dict vs compact row memory")
+    row_parser.add_argument("--batch-sizes", type=int, nargs="+",
+                            default=[1000, 10_000, 100_000])
+
+    parse_parser = commands.add_parser("parse", help="CSV parse throughput")
+    parse_parser.add_argument("--size-mb", type=float, default=256)
+    parse_parser.add_argument("--path", help="parse this CSV instead of a synthetic one")
+
+    suite_parser = commands.add_parser("suite", help="every generator, machine-readable")
+    suite_parser.add_argument("--sizes", type=int, nargs="+",
+                              default=[10_000, 100_000, 1_000_000])
+    suite_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 10_000])
+    suite_parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    suite_parser.add_argument("--output", help="write results as JSON to this file")
+
+    args = parser.parse_args()
+    # Exported so spawned measurement processes use the same backend
+    os.environ['DB_BACKEND'] = args.backend
+    backend.set_backend(args.backend)
+
+    if args.command == "seed":
+        bench_seed(args.sizes, args.chunk_size)
+    elif args.command == "stream-memory":
+        raise SystemExit(0 if bench_stream_memory(args.sizes) else 1)
+    elif args.command == "paginate":
+        bench_paginate(args.rows, args.page_size)
+    elif args.command == "aggregate":
+        bench_aggregate(args.rows)
+    elif args.command == "prefetch":
+        bench_prefetch(args.rows, args.batch_size, args.work_ms, args.depths)
+    elif args.command == "adaptive":
+        bench_adaptive(args.rows, args.batch_sizes, args.target_ms, args.memory_budget_kb)
+    elif args.command == "async":
+        bench_async(args.rows, args.streams)
+    elif args.command == "row-memory":
+        bench_row_memory(args.batch_sizes)
+    elif args.command == "parse":
+        bench_parse(args.size_mb, args.path)
+    elif args.command == "suite":
+        bench_suite(args.sizes, args.batch_sizes, args.workloads, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+"""
+Checkpointed, resumable scans over user_data
+
+Progress is stored as the last user_id a job has finished with, in a
+local SQLite file, so a long scan that dies can restart right after it
+instead of from the first row.
+"""
+
+import os
+import sqlite3
+import time
+
+paginate = __import__('2-lazy_paginate')
+
+DEFAULT_PATH = os.getenv('CHECKPOINT_DB', 'checkpoints.db')
+
+
+class CheckpointStore:
+    """Last committed key and row count per job, kept in SQLite"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job TEXT PRIMARY KEY,
+                last_key TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def load(self, job):
+        """(last_key, rows) saved for job, or (None, 0)"""
+        row = self.connection.execute(
+            "SELECT last_key, rows FROM checkpoints WHERE job = ?", (job,)
+        ).fetchone()
+        return row if row else (None, 0)
+
+    def save(self, job, last_key, rows):
+        """Record that job has processed everything up to last_key"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO checkpoints (job, last_key, rows, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (job, last_key, rows, time.time())
+        )
+        self.connection.commit()
+
+    def clear(self, job):
+        """Forget job's progress"""
+        self.connection.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def resumable_pagination(job, page_size, resume=False, store=None, save_every=1):
+    """
+    Generator that yields pages of users in user_id order (keyset
+    pagination), checkpointing progress under the name `job`.
+
+    A page counts as done once the caller asks for the next one, so a
+    crash while processing a page replays that page on resume. The
+    checkpoint is written every save_every pages and removed when the
+    scan completes. With resume=False any old checkpoint is discarded
+    and the scan starts from the first row.
+    """
+    own_store = store is None
+    store = store or CheckpointStore()
+    try:
+        if resume:
+            last_key, rows = store.load(job)
+        else:
+            store.clear(job)
+            last_key, rows = None, 0
+        cursor = paginate.encode_cursor(last_key) if last_key is not None else None
+
+        pages = 0
+        try:
+            for page in paginate.keyset_pagination(page_size, cursor):
+                yield page
+                last_key = page[-1]["user_id"]
+                rows += len(page)
+                pages += 1
+                if pages % save_every == 0:
+                    store.save(job, last_key, rows)
+        except GeneratorExit:
+            # Caller stopped early: keep the pages it has finished
+            if pages % save_every:
+                store.save(job, last_key, rows)
+            raise
+        store.clear(job)
+    finally:
+        if own_store:
+            store.close()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+"""
+Streaming parser for user_data CSV files
+
+Reads the file through a large buffer with the C csv reader and
+yields chunks of ready-to-insert (user_id, name, email, age) tuples,
+with age as an int, emails validated and UUIDs generated per chunk.
+"""
+
+import csv
+import os
+import re
+
+EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+# RFC 4122 variant digit for each random hex digit
+_VARIANT = {digit: "89ab"[int(digit, 16) & 3] for digit in "0123456789abcdef"}
+
+
+class ParseStats:
+    """Counters filled in while a file is parsed"""
+
+    def __init__(self):
+        self.rows = 0
+        self.rejected = 0
+        self.bytes = 0
+
+
+def bulk_uuids(count):
+    """
+    count random (version 4) UUID strings from one urandom call,
+    formatted straight from hex instead of via uuid.UUID objects
+    """
+    h = os.urandom(16 * count).hex()
+    return [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-4{h[i + 13:i + 16]}-"
+        f"{_VARIANT[h[i + 16]]}{h[i + 17:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
+
+def iter_user_chunks(csv_file, chunk_size=5000, buffer_size=1 << 20, stats=None):
+    """
+    Generator that yields lists of at most chunk_size
+    (user_id, name, email, age) tuples parsed from csv_file.
+    Rows with a malformed email or a non-numeric age are skipped
+    and counted in stats.rejected.
+    """
+    stats = stats if stats is not None else ParseStats()
+    with open(csv_file, "r", encoding="utf-8", newline="", buffering=buffer_size) as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        name_at, email_at, age_at = (header.index(column) for column in ("name", "email", "age"))
+        match_email = EMAIL_RE.fullmatch
+
+        names, emails, ages = [], [], []
+
+        def flush():
+            count = len(names)
+            stats.rows += count
+            chunk = list(zip(bulk_uuids(count), names, emails, ages))
+            names.clear()
+            emails.clear()
+            ages.clear()
+            return chunk
+
+        for row in reader:
+            try:
+                email = row[email_at]
+                age = int(row[age_at])
+            except (IndexError, ValueError):
+                stats.rejected += 1
+                continue
+            if not match_email(email):
+                stats.rejected += 1
+                continue
+            names.append(row[name_at])
+            emails.append(email)
+            ages.append(age)
+            if len(names) >= chunk_size:
+                stats.bytes = file.buffer.tell()
+                yield flush()
+        if names:
+            yield flush()
+        stats.bytes = file.buffer.tell()
@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+"""
+Shared MySQL connection pool for the python-generators-0x00 modules
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+class PoolTimeout(mysql.connector.Error):
+    """No connection became available within the checkout timeout"""
+
+
+def get_db_config(include_database=True):
+    """Get database configuration from environment variables"""
+    config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'port': os.getenv('DB_PORT', '3306')
+    }
+
+    if include_database:
+        config['database'] = os.getenv('DB_NAME', 'ALX_prodev')
+
+    return config
+
+
+class PooledConnection:
+    """
+    Proxy for a connection borrowed from a ConnectionPool.
+    Behaves like the underlying connection, except that close()
+    (or leaving a with block) hands it back to the pool.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise mysql.connector.Error("Connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    def is_connected(self):
+        return self._connection is not None and self._connection.is_connected()
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def discard(self):
+        """
+        Drop the connection instead of returning it to the pool,
+        without reading whatever is left of an unbuffered result
+        """
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.discard(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of up to size + max_overflow connections.
+
+    Up to `size` idle connections are kept for reuse; overflow
+    connections are closed when returned. Idle connections older than
+    idle_timeout seconds are dropped, and every checkout checks the
+    connection is still alive, so callers never get a dead socket.
+    """
+
+    def __init__(self, config, size=5, max_overflow=10, idle_timeout=300,
+                 health_check=True, connect=mysql.connector.connect):
+        # A returned connection must be reusable even if its last user
+        # stopped reading a result set halfway
+        self.config = dict(config, consume_results=True)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._connect = connect
+        self._idle = deque()
+        self._open = 0
+        self._lock = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "discarded": 0, "waits": 0}
+
+    @property
+    def in_use(self):
+        """Connections currently checked out"""
+        return self._open - len(self._idle)
+
+    def _discard(self, connection):
+        self._open -= 1
+        self.stats["discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _usable(self, connection, idle_since):
+        if self.idle_timeout is not None and time.monotonic() - idle_since > self.idle_timeout:
+            return False
+        if self.health_check:
+            try:
+                return connection.is_connected()
+            except Exception:
+                return False
+        return True
+
+    def connect(self, timeout=30):
+        """Borrow a connection, waiting up to timeout seconds for one"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                while self._idle:
+                    connection, idle_since = self._idle.pop()
+                    if self._usable(connection, idle_since):
+                        self.stats["reused"] += 1
+                        return PooledConnection(self, connection)
+                    self._discard(connection)
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                self.stats["waits"] += 1
+                if remaining <= 0 or not self._lock.wait(remaining):
+                    raise PoolTimeout(f"No connection available after {timeout}s")
+
+        # Open outside the lock so a slow handshake does not block others
+        try:
+            connection = self._connect(**self.config)
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.stats["created"] += 1
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """Return a connection; called by PooledConnection.close()"""
+        try:
+            # Drains any unread rows and ends an open transaction
+            connection.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._lock:
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+            self._lock.notify()
+
+    def discard(self, connection):
+        """
+        Drop a checked-out connection. Unlike release() (and close(),
+        with consume_results), it does not read the rest of an
+        unfinished result set first: the socket is just shut down.
+        """
+        try:
+            connection.shutdown()
+        except Exception:
+            pass
+        with self._lock:
+            self._open -= 1
+            self.stats["discarded"] += 1
+            self._lock.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on return)"""
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(include_database=True):
+    """The process-wide pool for the configured server (and database)"""
+    config = get_db_config(include_database)
+    key = tuple(sorted(config.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                config,
+                size=int(os.getenv('DB_POOL_SIZE', '5')),
+                max_overflow=int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+                idle_timeout=float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+            )
+        return _pools[key]
+
+
+def connect(include_database=True, timeout=30):
+    """Borrow a pooled connection; close() returns it to the pool"""
+    return get_pool(include_database).connect(timeout)
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+"""
+Columnar snapshots of user_data on local disk
+
+export_user_data streams the table through stream_users_in_batches
+into either an Arrow IPC file (when pyarrow is installed) or one raw
+file per column, and load_snapshot memory-maps it back so repeated
+analytics read the OS page cache instead of the database.
+"""
+
+import json
+import os
+from array import array
+
+import backend
+
+try:
+    import numpy as np
+except ImportError:  # only needed to read "memmap" snapshots
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # "arrow" snapshots need pyarrow
+    pa = None
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+META_FILE = "meta.json"
+ARROW_FILE = "user_data.arrow"
+
+# Column kinds used when the table is empty and no batch reveals them
+EMPTY_KINDS = {name: "int64" if name == "age" else "utf8" for name in backend.USER_COLUMNS}
+_ARRAY_CODES = {"int64": "q", "float64": "d"}
+_NUMPY_DTYPES = {"int64": "<i8", "float64": "<f8"}
+
+
+def _column_kind(values):
+    """int64, float64 or utf8 for one column of a columnar batch"""
+    if isinstance(values, array):
+        return "float64" if values.typecode == "d" else "int64"
+    if np is not None and values.dtype.kind in "iu":
+        return "int64"
+    if np is not None and values.dtype.kind == "f":
+        return "float64"
+    return "utf8"
+
+
+def _open_memmap_files(directory, kinds, files, offsets):
+    for name, kind in kinds.items():
+        path = os.path.join(directory, name)
+        if kind == "utf8":
+            offsets[name] = 0
+            files[name + ".offsets"] = open(path + ".offsets", "wb")
+            files[name + ".data"] = open(path + ".data", "wb")
+        else:
+            files[name + ".bin"] = open(path + ".bin", "wb")
+
+
+def _write_memmap_batch(files, columns, offsets, kinds):
+    """Append one columnar batch to the per-column raw files"""
+    for name, values in columns.items():
+        if name in offsets:
+            encoded = [str(value).encode("utf-8") for value in values]
+            ends = array('q')
+            position = offsets[name]
+            for item in encoded:
+                position += len(item)
+                ends.append(position)
+            offsets[name] = position
+            ends.tofile(files[name + ".offsets"])
+            files[name + ".data"].write(b"".join(encoded))
+        else:
+            code = _ARRAY_CODES[kinds[name]]
+            array(code, map(int if code == "q" else float, values)).tofile(files[name + ".bin"])
+
+
+def _export_memmap(directory, batches):
+    files = {}
+    offsets = {}
+    kinds = {}
+    rows = 0
+    try:
+        for columns in batches:
+            if not kinds:
+                kinds = {name: _column_kind(values) for name, values in columns.items()}
+                _open_memmap_files(directory, kinds, files, offsets)
+            _write_memmap_batch(files, columns, offsets, kinds)
+            rows += len(next(iter(columns.values())))
+        if not kinds:
+            # Empty table: still write (empty) files for every column
+            kinds = dict(EMPTY_KINDS)
+            _open_memmap_files(directory, kinds, files, offsets)
+    finally:
+        for file in files.values():
+            file.close()
+    return rows, kinds
+
+
+def _export_arrow(directory, batches):
+    path = os.path.join(directory, ARROW_FILE)
+    writer = None
+    rows = 0
+    kinds = {}
+    try:
+        for columns in batches:
+            record = pa.RecordBatch.from_pydict(
+                {name: pa.array(values) for name, values in columns.items()}
+            )
+            if writer is None:
+                kinds = {field.name: str(field.type) for field in record.schema}
+                writer = pa.ipc.new_file(path, record.schema)
+            writer.write_batch(record)
+            rows += record.num_rows
+        if writer is None:
+            # Empty table: an Arrow file with the schema and no batches
+            schema = pa.schema([(name, pa.int64() if kind == "int64" else pa.string())
+                                for name, kind in EMPTY_KINDS.items()])
+            kinds = {field.name: str(field.type) for field in schema}
+            writer = pa.ipc.new_file(path, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, kinds
+
+
+def export_user_data(directory, batch_size=10000, format="auto"):
+    """
+    Write a columnar snapshot of user_data into directory.
+    format is "arrow" (Arrow IPC, needs pyarrow), "memmap" (raw int64/float64
+    column files plus offsets/data files for strings) or "auto".
+    meta.json is written last, so a snapshot without it is incomplete:
+    a database error during the scan is raised and leaves no meta.json.
+    Returns the number of rows exported.
+    """
+    if format == "auto":
+        format = "arrow" if pa is not None else "memmap"
+    if format == "arrow" and pa is None:
+        raise ImportError("pyarrow is required for format='arrow'")
+    if format not in ("arrow", "memmap"):
+        raise ValueError(f"Unknown snapshot format: {format!r}")
+
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    batches = stream_users_in_batches(batch_size, columnar=True, raise_errors=True)
+    export = _export_arrow if format == "arrow" else _export_memmap
+    rows, kinds = export(directory, batches)
+
+    with open(meta_path, "w", encoding="utf-8") as file:
+        json.dump({"format": format, "rows": rows, "columns": kinds}, file)
+    return rows
+
+
+class StringColumn:
+    """Read-only view of a memory-mapped UTF-8 column"""
+
+    def __init__(self, data, ends):
+        self._data = data
+        self._ends = ends
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index):
+        start = self._ends[index - 1] if index > 0 else 0
+        return bytes(self._data[start:self._ends[index]]).decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def load_snapshot(directory):
+    """
+    Memory-map a snapshot written by export_user_data.
+    Returns a pyarrow Table for Arrow snapshots, or a
+    {column: array} dict (NumPy memmaps / StringColumn) otherwise.
+    """
+    with open(os.path.join(directory, META_FILE), encoding="utf-8") as file:
+        meta = json.load(file)
+
+    if meta["format"] == "arrow":
+        if pa is None:
+            raise ImportError("pyarrow is required to read Arrow snapshots")
+        source = pa.memory_map(os.path.join(directory, ARROW_FILE), "r")
+        return pa.ipc.open_file(source).read_all()
+
+    if np is None:
+        raise ImportError("numpy is required to read memmap snapshots")
+
+    def mapped(path, dtype, length):
+        # mmap cannot map an empty file
+        if not length:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(length,))
+
+    rows = meta["rows"]
+    columns = {}
+    for name, kind in meta["columns"].items():
+        path = os.path.join(directory, name)
+        if kind in _NUMPY_DTYPES:
+            columns[name] = mapped(path + ".bin", _NUMPY_DTYPES[kind], rows)
+        else:
+            ends = mapped(path + ".offsets", "<i8", rows)
+            size = int(ends[-1]) if rows else 0
+            columns[name] = StringColumn(mapped(path + ".data", np.uint8, size), ends)
+    return columns
+
+
+def snapshot_average_age(directory):
+    """average_age computed from a local snapshot instead of MySQL"""
+    snapshot = load_snapshot(directory)
+    if pa is not None and isinstance(snapshot, pa.Table):
+        mean = pc.mean(snapshot["age"]).as_py()
+        return mean or 0
+    ages = snapshot["age"]
+    return float(ages.mean()) if len(ages) else 0
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+"""
+Bounded worker-pool pipeline for generator sources
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+_DONE = object()
+
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+class PipelineMetrics:
+    """Throughput counters filled in while a pipeline runs"""
+
+    def __init__(self):
+        self.items = 0
+        self.rows = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        """Seconds between the first submit and the last result"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def items_per_sec(self):
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"PipelineMetrics(items={self.items}, rows={self.rows}, "
+                f"elapsed={self.elapsed:.2f}s, rows/sec={self.rows_per_sec:.0f})")
+
+
+def parallel_map(items, func, workers=4, executor="thread", max_pending=None,
+                 ordered=True, metrics=None):
+    """
+    Generator that yields func(item) for each item of `items`, run on a
+    pool of `workers` threads or processes.
+
+    At most max_pending items (default 2 * workers) are in flight, so a
+    slow pool applies backpressure to the producer instead of letting it
+    read the whole source ahead. With ordered=True results come back in
+    input order; otherwise as soon as each one finishes. Pass a
+    PipelineMetrics to collect throughput. func must be picklable
+    (a module-level function) when executor="process".
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor!r}")
+    max_pending = max_pending or 2 * workers
+    metrics = metrics if metrics is not None else PipelineMetrics()
+    source = iter(items)
+    pending = deque() if ordered else set()
+
+    def submit(pool):
+        """Submit the next item; False once the source is exhausted"""
+        try:
+            item = next(source)
+        except StopIteration:
+            return False
+        if metrics.started is None:
+            metrics.started = time.perf_counter()
+        metrics.items += 1
+        if hasattr(item, "__len__"):
+            metrics.rows += len(item)
+        future = pool.submit(func, item)
+        if ordered:
+            pending.append(future)
+        else:
+            pending.add(future)
+        return True
+
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    exhausted = not submit(pool)
+                if not pending:
+                    break
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+        finally:
+            # Caller stopped early or a worker failed: drop queued work
+            for future in pending:
+                future.cancel()
+            metrics.finished = time.perf_counter()
+
+
+def prefetch(items, depth=1):
+    """
+    Generator that yields the items of `items` while a background
+    thread already produces the next `depth` of them, so the producer
+    (e.g. a database fetch) overlaps with the caller's processing.
+    Exceptions raised by the producer are re-raised in the caller;
+    closing the generator stops the thread and closes the source.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        source = iter(items)
+        try:
+            for item in source:
+                if not put(item):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            # Close the source on this thread, which is the one using it
+            if hasattr(source, "close"):
+                source.close()
+            put(_DONE)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+"""
+Range-partitioned parallel scan of the user_data table
+"""
+
+import queue
+import threading
+
+import backend
+
+# Range bounds are placed on the first KEY_DIGITS hex digits of user_id
+KEY_DIGITS = 12
+KEY_SPACE = 16 ** KEY_DIGITS
+_DONE = object()
+
+
+def _key_number(key):
+    """The leading KEY_DIGITS hex digits of a UUID string, as an int"""
+    return int(key.replace("-", "")[:KEY_DIGITS].ljust(KEY_DIGITS, "0"), 16)
+
+
+def _key_string(number):
+    """A UUID prefix that sorts like the keys starting with number"""
+    digits = format(number, f"0{KEY_DIGITS}x")
+    return f"{digits[:8]}-{digits[8:]}"
+
+
+def key_bounds(connection):
+    """
+    (smallest, largest) user_id as numbers (see _key_number), or
+    (None, None) if the table is empty or its keys are not UUIDs
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT MIN(user_id), MAX(user_id) FROM user_data")
+        first, last = cursor.fetchone()
+    finally:
+        cursor.close()
+    try:
+        return _key_number(first), _key_number(last)
+    except (AttributeError, ValueError):
+        return None, None
+
+
+def key_ranges(partitions, first=None, last=None):
+    """
+    Split the user_id keys between first and last (from key_bounds;
+    None: the whole UUID space) into `partitions` half-open ranges
+    (low, high); None means unbounded on that side.
+
+    Splitting the stored span instead of the whole key space keeps
+    the ranges even when keys cluster, e.g. the time-based UUID()s
+    LOAD DATA generates all share a few leading digits.
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    if first is None or last is None:
+        first, last = 0, KEY_SPACE - 1
+    span = last - first + 1
+    bounds = [_key_string(first + i * span // partitions) for i in range(1, partitions)]
+    lows = [None] + bounds
+    highs = bounds + [None]
+    return list(zip(lows, highs))
+
+
+def scan_range(connection, columns, low, high, fetch_size=1000):
+    """Generator over the rows of user_data with low <= user_id < high"""
+    clauses = []
+    params = []
+    if low is not None:
+        clauses.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        clauses.append("user_id < %s")
+        params.append(high)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    db = backend.get_backend()
+    cursor = db.cursor(connection, dictionary=True, streaming=True)
+    try:
+        cursor.execute(db.sql(f"SELECT {', '.join(columns)} FROM user_data{where}"), params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def partitioned_scan(columns=("user_id", "name", "email", "age"), partitions=4,
+                     fetch_size=1000, max_buffered=10000):
+    """
+    Generator that scans user_data as `partitions` key ranges, each
+    streamed on its own connection in its own thread, and merges the
+    rows into one iterator (in no particular order).
+
+    At most max_buffered rows wait in the merge queue, so fast
+    partitions block instead of racing ahead of the consumer.
+    """
+    rows = queue.Queue(maxsize=max(1, max_buffered // fetch_size))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                rows.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(low, high):
+        connection = None
+        rows_in_range = None
+        stopped = False
+        try:
+            connection = backend.connect()
+            rows_in_range = scan_range(connection, columns, low, high, fetch_size)
+            chunk = []
+            for row in rows_in_range:
+                chunk.append(row)
+                if len(chunk) >= fetch_size:
+                    if not put(chunk):
+                        stopped = True
+                        return
+                    chunk = []
+            if chunk:
+                put(chunk)
+        except Exception as e:
+            put(e)
+        finally:
+            try:
+                if stopped:
+                    # The consumer stopped early. Closing the cursor or
+                    # returning a pooled connection would read every
+                    # remaining row of the range (consume_results), so
+                    # drop the connection first; the cursor then closes
+                    # without draining
+                    getattr(connection, "discard", connection.close)()
+                    rows_in_range.close()
+                elif connection:
+                    connection.close()
+            except Exception:
+                # A failed close must not keep _DONE from the consumer
+                pass
+            put(_DONE)
+
+    first = last = None
+    if partitions > 1:
+        connection = backend.connect()
+        try:
+            first, last = key_bounds(connection)
+        finally:
+            connection.close()
+    threads = [threading.Thread(target=worker, args=bounds, daemon=True)
+               for bounds in key_ranges(partitions, first, last)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        running = len(threads)
+        while running:
+            item = rows.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield from item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+"""
+Composable lazy pipelines over the user_data generators
+
+    source(stream_users()) | filter_(lambda u: u["age"] > 25) \\
+        | map_(lambda u: u["email"]) | batch(100) | for_each(print)
+
+Per-item map_/filter_ stages are compiled straight into the built-in
+map/filter iterators, so a chain of them runs without any Python
+generator frame in between. pmap runs a stage on a thread or process
+pool.
+"""
+
+from collections import deque
+from functools import reduce
+from itertools import chain, islice
+
+import parallel
+
+_MAP = "map"
+_FILTER = "filter"
+
+
+class Stage:
+    """
+    A lazy transformation from one iterable to another, wrapping
+    func(items) -> iterable. Custom stages are Stage(func), e.g.
+    Stage(lambda users: sorted(users, key=...)).
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def apply(self, items):
+        return self.func(items)
+
+
+class _ItemStage(Stage):
+    """Per-item map or filter, compiled by Pipeline into map/filter"""
+
+    def __init__(self, kind, func):
+        super().__init__(func)
+        self.kind = kind
+
+    def apply(self, items):
+        return _fused(items, [(self.kind, self.func)])
+
+
+class Sink:
+    """Terminal stage: `pipeline | sink` runs the pipeline"""
+
+    def __init__(self, consume):
+        self.consume = consume
+
+
+def _fused(items, ops):
+    """Chain per-item ops as C-level map/filter iterators"""
+    for kind, func in ops:
+        items = map(func, items) if kind is _MAP else filter(func, items)
+    return items
+
+
+class Pipeline:
+    """A source plus the stages applied to it; iterate to run lazily"""
+
+    def __init__(self, source, stages=()):
+        self.source = source
+        self.stages = tuple(stages)
+
+    def __or__(self, stage):
+        if isinstance(stage, Sink):
+            return stage.consume(iter(self))
+        if not isinstance(stage, Stage):
+            raise TypeError(f"Cannot pipe into {stage!r}")
+        return Pipeline(self.source, self.stages + (stage,))
+
+    def __iter__(self):
+        items = self.source() if callable(self.source) else self.source
+        ops = []
+        for stage in self.stages:
+            if isinstance(stage, _ItemStage):
+                ops.append((stage.kind, stage.func))
+                continue
+            if ops:
+                items = _fused(items, ops)
+                ops = []
+            items = stage.apply(items)
+        if ops:
+            items = _fused(items, ops)
+        return iter(items)
+
+
+def source(items):
+    """Start a pipeline from an iterable or a zero-argument factory"""
+    return Pipeline(items)
+
+
+# Stages
+
+def map_(func):
+    """Replace each item with func(item)"""
+    return _ItemStage(_MAP, func)
+
+
+def filter_(predicate):
+    """Keep items for which predicate(item) is true"""
+    return _ItemStage(_FILTER, predicate)
+
+
+def flatten():
+    """Turn a stream of batches into a stream of items"""
+    return Stage(chain.from_iterable)
+
+
+def take(count):
+    """Stop after count items"""
+    return Stage(lambda items: islice(items, count))
+
+
+def batch(size):
+    """Group items into lists of at most size items"""
+    def batches(items):
+        items = iter(items)
+        while True:
+            group = list(islice(items, size))
+            if not group:
+                return
+            yield group
+    return Stage(batches)
+
+
+def window(size, step=1):
+    """Sliding windows (tuples) of size items, advancing step at a time"""
+    def windows(items):
+        current = deque(maxlen=size)
+        for index, item in enumerate(items):
+            current.append(item)
+            # Windows start at items 0, step, 2 * step, ...
+            if len(current) == size and (index - size + 1) % step == 0:
+                yield tuple(current)
+    return Stage(windows)
+
+
+def pmap(func, workers=4, executor="thread", ordered=True, max_pending=None, metrics=None):
+    """func(item) on a worker pool (see parallel.parallel_map)"""
+    return Stage(lambda items: parallel.parallel_map(
+        items, func, workers=workers, executor=executor,
+        max_pending=max_pending, ordered=ordered, metrics=metrics))
+
+
+# Sinks
+
+def to_list():
+    """Collect every item into a list"""
+    return Sink(list)
+
+
+def for_each(func):
+    """Call func(item) for every item"""
+    def consume(items):
+        for item in items:
+            func(item)
+    return Sink(consume)
+
+
+def reduce_(func, initial):
+    """Fold the items with func, starting from initial"""
+    return Sink(lambda items: reduce(func, items, initial))
+
+
+def count():
+    """Number of items"""
+    return Sink(lambda items: sum(1 for _ in items))
@@ -0,0 +1,23 @@
+#!/usr/bin/python3
+"""
+Compact row types for streamed user_data rows
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def row_type(column_names):
+    """
+    Named tuple class for a cursor's column names, built once per
+    distinct column list. A 4-column row costs a small fixed-size tuple
+    instead of a dict with its own hash table.
+    """
+    return namedtuple("UserRow", column_names)
+
+
+def compact_rows(column_names, rows):
+    """Convert fetched tuples into the row type for column_names"""
+    make = row_type(tuple(column_names))._make
+    return [make(row) for row in rows]
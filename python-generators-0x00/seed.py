@@ -5,35 +5,24 @@ Seed script for ALX_prodev MySQL database
 
 import mysql.connector
 from mysql.connector import Error
-import csv
-import uuid
 import os
-from dotenv import load_dotenv
+import time
+from itertools import chain
 
-# Load environment variables from .env file
-load_dotenv()
+import age_stats
+import csv_ingest
+import db_pool
 
 
 def get_db_config(include_database=True):
     """Get database configuration from environment variables"""
-    config = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'user': os.getenv('DB_USER', 'root'),
-        'password': os.getenv('DB_PASSWORD', ''),
-        'port': os.getenv('DB_PORT', '3306')
-    }
-    
-    if include_database:
-        config['database'] = os.getenv('DB_NAME', 'ALX_prodev')
-    
-    return config
+    return db_pool.get_db_config(include_database)
+
 
 def connect_db():
     """Connects to MySQL server (not to a specific DB)"""
     try:
-        config = get_db_config(include_database=False)
-
-        connection = mysql.connector.connect(**config)
+        connection = db_pool.connect(include_database=False)
         if connection.is_connected():
             return connection
     except Error as e:
@@ -51,12 +40,19 @@ def create_database(connection):
         print(f"Error creating database: {e}")
 
 
-def connect_to_prodev():
-    """Connects directly to ALX_prodev database"""
+def connect_to_prodev(allow_local_infile=False):
+    """
+    Connects directly to ALX_prodev database, borrowing from the shared
+    pool; close() returns the connection to the pool
+    """
     try:
-        config = get_db_config(include_database=True)
-
-        connection = mysql.connector.connect(**config)
+        if allow_local_infile:
+            # LOAD DATA LOCAL needs a dedicated, non-pooled connection
+            config = get_db_config(include_database=True)
+            config['allow_local_infile'] = True
+            connection = mysql.connector.connect(**config)
+        else:
+            connection = db_pool.connect(include_database=True)
         if connection.is_connected():
             return connection
     except Error as e:
@@ -74,40 +70,116 @@ def create_table(connection):
                 name VARCHAR(255) NOT NULL,
                 email VARCHAR(255) NOT NULL,
                 age DECIMAL NOT NULL,
-                INDEX(user_id)
+                UNIQUE INDEX idx_user_data_email (email)
             );
         """)
         connection.commit()
         cursor.close()
+        migrate_email_index(connection)
+        age_stats.create_stats_table(connection)
         print("Table user_data created successfully")
     except Error as e:
         print(f"Error creating table: {e}")
 
 
-def insert_data(connection, csv_file):
-    """Insert CSV data into user_data if not already inserted"""
-    try:
-        cursor = connection.cursor()
-
-        with open(csv_file, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                user_id = str(uuid.uuid4())
-                name = row["name"]
-                email = row["email"]
-                age = row["age"]
-
-                # Check if email already exists (to avoid duplicates)
-                cursor.execute("SELECT * FROM user_data WHERE email = %s", (email,))
-                if cursor.fetchone():
-                    continue
+def migrate_email_index(connection):
+    """
+    Brings an existing user_data table up to the current schema:
+    drops the redundant index on user_id, removes duplicate emails
+    (keeping the lowest user_id) and adds the unique email index
+    """
+    cursor = connection.cursor()
+    cursor.execute("SHOW INDEX FROM user_data WHERE Key_name = 'user_id'")
+    if cursor.fetchall():
+        cursor.execute("ALTER TABLE user_data DROP INDEX user_id")
+
+    cursor.execute(
+        "SHOW INDEX FROM user_data WHERE Column_name = 'email' AND Non_unique = 0"
+    )
+    if not cursor.fetchall():
+        cursor.execute("""
+            DELETE newer FROM user_data newer
+            JOIN user_data older
+              ON newer.email = older.email AND newer.user_id > older.user_id
+        """)
+        cursor.execute(
+            "ALTER TABLE user_data ADD UNIQUE INDEX idx_user_data_email (email)"
+        )
+    connection.commit()
+    cursor.close()
 
-                cursor.execute(
-                    "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
-                    (user_id, name, email, age)
-                )
 
-        connection.commit()
-        cursor.close()
+def insert_data(connection, csv_file):
+    """Insert CSV data into user_data, updating rows whose email exists"""
+    return bulk_insert_data(connection, csv_file)
+
+
+def _load_data_infile(connection, csv_file):
+    """Bulk-load csv_file server-side with LOAD DATA LOCAL INFILE"""
+    cursor = connection.cursor()
+    cursor.execute(
+        "LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data "
+        "FIELDS TERMINATED BY ',' ENCLOSED BY '\"' "
+        "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+        "(name, email, age) SET user_id = UUID()",
+        (os.path.abspath(csv_file),)
+    )
+    inserted = cursor.rowcount
+    connection.commit()
+    cursor.close()
+    # The server did the inserts, so recount instead of tracking them
+    age_stats.rebuild(connection)
+    return inserted
+
+
+UPSERT_SQL = (
+    "INSERT INTO user_data (user_id, name, email, age) VALUES {values} "
+    "ON DUPLICATE KEY UPDATE name = VALUES(name), age = VALUES(age)"
+)
+
+
+def bulk_insert_data(connection, csv_file, chunk_size=5000, local_infile=False):
+    """
+    Bulk-load CSV data into user_data, chunk_size rows per round trip.
+
+    Rows are parsed by csv_ingest.iter_user_chunks (typed, validated,
+    UUIDs generated per chunk) and each chunk is written with a single
+    multi-row upsert and committed. The unique email index does the
+    deduplication, so a row whose email is already stored updates name
+    and age and keeps its user_id. user_age_stats is updated in the
+    same transaction as each chunk (see age_stats).
+    With local_infile=True the file is handed to the server with
+    LOAD DATA LOCAL INFILE instead, which skips existing emails (the
+    connection must be opened with connect_to_prodev(allow_local_infile=True)).
+    Returns the number of CSV rows processed, or with local_infile=True
+    the number of rows inserted (the server does not report the rows
+    it skipped as duplicates).
+    """
+    start = time.perf_counter()
+    processed = 0
+    label = "inserted" if local_infile else "loaded"
+    try:
+        if local_infile:
+            processed = _load_data_infile(connection, csv_file)
+        else:
+            cursor = connection.cursor()
+            stats = csv_ingest.ParseStats()
+            for chunk in csv_ingest.iter_user_chunks(csv_file, chunk_size, stats=stats):
+                values = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+                params = list(chain.from_iterable(chunk))
+                before = age_stats.ages_for_emails(cursor, chunk)
+                cursor.execute(UPSERT_SQL.format(values=values), params)
+                age_stats.record_upsert(cursor, chunk, before)
+                connection.commit()
+                processed += len(chunk)
+            cursor.close()
+            if stats.rejected:
+                print(f"Skipped {stats.rejected} malformed rows")
     except Error as e:
-        print(f"Error inserting data: {e}")
\ No newline at end of file
+        print(f"Error bulk inserting data: {e}")
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0
+    print(f"{label.capitalize()} {processed} rows in {elapsed:.2f}s "
+          f"({rate:.0f} rows {label}/sec)")
+    return processed
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Unit tests for the pipeline stages."""
+import unittest
+
+from pipeline import source, window, to_list
+
+
+class TestWindow(unittest.TestCase):
+    """Test cases for the window stage."""
+
+    def test_windows(self):
+        """Test windows start every step items from the first one."""
+        cases = [
+            (5, 3, 1, [(0, 1, 2), (1, 2, 3), (2, 3, 4)]),
+            (5, 3, 2, [(0, 1, 2), (2, 3, 4)]),
+            (7, 3, 3, [(0, 1, 2), (3, 4, 5)]),
+            (10, 3, 5, [(0, 1, 2), (5, 6, 7)]),
+            (10, 2, 3, [(0, 1), (3, 4), (6, 7)]),
+            (2, 3, 1, []),
+        ]
+        for count, size, step, expected in cases:
+            with self.subTest(count=count, size=size, step=step):
+                result = source(range(count)) | window(size, step) | to_list()
+                self.assertEqual(result, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()